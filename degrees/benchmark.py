@@ -0,0 +1,207 @@
+import argparse
+import csv
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import degrees
+import distances
+
+
+def write_synthetic_dataset(directory, n_people, n_movies, cast_size, seed=0):
+    """
+    Write people.csv, movies.csv and stars.csv for a random actor-movie
+    graph into `directory`.
+
+    Every movie gets `cast_size` distinct stars chosen uniformly at random,
+    so the dataset has `n_movies * cast_size` star rows. Every 1000th movie
+    also gets a star row for a person that does not exist, like the
+    dangling rows of the real IMDb export.
+    """
+    rng = random.Random(seed)
+
+    with open(os.path.join(directory, "people.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(n_people):
+            writer.writerow([i, f"Person {i}", 1900 + i % 100])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(n_movies):
+            writer.writerow([i, f"Movie {i}", 1950 + i % 70])
+
+    with open(os.path.join(directory, "stars.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie_id in range(n_movies):
+            for person_id in rng.sample(range(n_people), cast_size):
+                writer.writerow([person_id, movie_id])
+            if movie_id % 1000 == 0:
+                writer.writerow([n_people + movie_id, movie_id])
+
+
+def reset():
+    """Empty the module level data structures of degrees."""
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.graph = None
+    degrees.name_index = None
+
+
+def measure_strategies(strategies, n_queries, seed=1):
+    """
+    Run the same `n_queries` random shortest_path queries with every
+    search strategy. Return {strategy: mean of the search stats}, where
+    seconds is reported as milliseconds ("ms").
+    """
+    rng = random.Random(seed)
+    person_ids = list(degrees.people)
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(n_queries)]
+
+    results = {}
+    for strategy in strategies:
+        totals = {}
+        for source, target in pairs:
+            stats = {}
+            degrees.shortest_path(source, target, strategy, stats)
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        means = {key: value / n_queries for key, value in totals.items()}
+        means["ms"] = 1000 * means.pop("seconds")
+        results[strategy] = means
+    return results
+
+
+def time_traversal():
+    """
+    Breadth-first traverse the whole component of the first person.
+    Return the number of (person, movie) edges scanned per second.
+    """
+    graph = degrees.graph
+    start = time.perf_counter()
+    explored = {0}
+    layer = [0]
+    scanned = 0
+    while layer:
+        next_layer = []
+        for person in layer:
+            for aid, mid in graph.co_stars(person):
+                scanned += 1
+                if aid not in explored:
+                    explored.add(aid)
+                    next_layer.append(aid)
+        layer = next_layer
+    return scanned / (time.perf_counter() - start)
+
+
+def time_name_lookups(n_lookups=200, seed=1):
+    """
+    Build the name index, then look up prefixes and misspellings (one
+    character dropped) of random names in it. Return (build seconds,
+    lookups per second, recall): recall is the share of misspellings
+    whose person is among the results. Misspellings that are the name of
+    someone else are not counted for recall.
+    """
+    rng = random.Random(seed)
+    person_ids = list(degrees.people)
+    queries = []
+    misspellings = []
+    for _ in range(n_lookups // 2):
+        person_id = rng.choice(person_ids)
+        name = degrees.people[person_id]["name"]
+        queries.append(name[:len(name) // 2 + 1])
+        i = rng.randrange(len(name))
+        queries.append(name[:i] + name[i + 1:])
+        if queries[-1].lower() not in degrees.names:
+            misspellings.append((len(queries) - 1, person_id))
+
+    start = time.perf_counter()
+    name_index = degrees.name_lookup()
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [name_index.search(query) for query in queries]
+    lookups_per_second = len(queries) / (time.perf_counter() - start)
+
+    found = sum(any(person_id in ids for _, ids in results[i]) for i, person_id in misspellings)
+    return build_seconds, lookups_per_second, found / len(misspellings) if misspellings else 1.0
+
+
+def time_parsers(directory):
+    """
+    Load `directory` once with every CSV parser, without the snapshot.
+    Return ({parser: rows per second}, dropped star rows).
+    """
+    throughput = {}
+    for parser in degrees.ingest.PARSERS:
+        reset()
+        stats = degrees.load_data(directory, use_snapshot=False, parser=parser)
+        throughput[parser] = stats["rows_per_second"]
+    return throughput, sum(stats["dropped"].values())
+
+
+def benchmark_directory(directory, label, n_queries, n_landmarks):
+    """
+    Load the dataset in `directory` and print its load, memory, lookup and
+    per-strategy search measurements under the heading `label`.
+    """
+    throughput, dropped = time_parsers(directory)
+    graph = degrees.graph
+    strategies = ["bfs", "bidirectional"]
+    if n_landmarks:
+        distances.build_landmarks(directory, n_landmarks)
+        degrees.load_landmarks(directory)
+        strategies.append("alt")
+
+    print(f"{label}: {graph.n_people} people, {graph.n_movies} movies, "
+          f"{graph.n_edges} edges, {dropped} star rows dropped")
+    print("  load rows/s: " + ", ".join(f"{p} {r:.0f}" for p, r in throughput.items()))
+    build_seconds, lookups_per_second, recall = time_name_lookups()
+    print(f"  graph {graph.nbytes() / 2**20:.1f} MB, "
+          f"traversal {time_traversal():.0f} edges/s")
+    print(f"  name index {degrees.name_index.nbytes() / 2**20:.1f} MB of positions, "
+          f"built in {build_seconds:.2f}s, {lookups_per_second:.0f} lookups/s, "
+          f"misspelling recall {recall:.0%}")
+
+    results = measure_strategies(strategies, n_queries)
+    print(f"  {'strategy':<14} {'ms':>10} {'expanded':>12} {'scanned':>12} {'peak':>10}")
+    for strategy, means in results.items():
+        print(f"  {strategy:<14} {means['ms']:>10.2f} {means['nodes_expanded']:>12.0f} "
+              f"{means['edges_scanned']:>12.0f} {means['frontier_peak']:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark degrees on the small dataset and synthetic graphs.")
+    parser.add_argument("sizes", nargs="*", type=int, default=[10_000, 100_000, 1_000_000],
+                        help="numbers of people of the synthetic graphs")
+    parser.add_argument("--cast-size", type=int, default=10,
+                        help="stars per synthetic movie")
+    parser.add_argument("--queries", type=int, default=20,
+                        help="random queries per strategy and dataset")
+    parser.add_argument("--landmarks", type=int, default=16,
+                        help="landmarks for the alt strategy, 0 to skip it")
+    args = parser.parse_args()
+
+    # all randomness is seeded, so repeated runs measure the same queries
+    with tempfile.TemporaryDirectory() as directory:
+        shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)), "small"),
+                        directory, dirs_exist_ok=True)
+        reset()
+        benchmark_directory(directory, "small", args.queries, args.landmarks)
+
+    for n_people in args.sizes:
+        n_movies = n_people // 2
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_dataset(directory, n_people, n_movies, args.cast_size)
+            reset()
+            benchmark_directory(directory, f"synthetic {n_people}", args.queries, args.landmarks)
+
+
+if __name__ == "__main__":
+    main()
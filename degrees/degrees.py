@@ -1,55 +1,160 @@
-import csv
+import math
+import os
 import sys
+import time
+from array import array
 
-# from util import Node, StackFrontier, QueueFrontier
+import ingest
+import landmarks
+import snapshot
+from graph import ActorGraph
+from nameindex import NameIndex
+from util import QueueFrontier
+
+CSV_FILES = ("people.csv", "movies.csv", "stars.csv")
 
 # Maps names to a set of corresponding person_ids
 names = {}
 
-# Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
+# Maps person_ids to a dictionary of: name, birth
 people = {}
 
-# Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
+# Maps movie_ids to a dictionary of: title, year
 movies = {}
 
+# Compact person <-> movie adjacency (see graph.ActorGraph)
+graph = None
+
+# Optional landmarks.LandmarkIndex used by the "alt" search strategy
+landmark_index = None
+
+# Prefix and fuzzy lookup over the keys of `names`, built by `name_lookup`
+# when a name first needs it, so loading a snapshot stays fast
+name_index = None
 
-def load_data(directory):
+
+def load_data(directory, use_snapshot=True, parser="reader"):
     """
     Load data from CSV files into memory.
+
+    `parser` names the CSV row parser from ingest.PARSERS. Names, birth
+    years and release years are interned, so repeated values share one
+    string. Star rows that reference an unknown person or movie, or repeat
+    an earlier row, are dropped and counted.
+
+    With `use_snapshot`, the parsed data is also written to a binary
+    snapshot next to the CSV files. Later calls memory-map that snapshot
+    instead of parsing the CSV files again, until one of the CSV files
+    changes its modification time or size.
+
+    Returns load statistics: the number of rows, seconds and rows per
+    second, and the dropped star rows by reason.
     """
+    global graph, name_index
+
+    start = time.perf_counter()
+    dropped = {"unknown_person": 0, "unknown_movie": 0, "duplicate": 0}
+
+    if use_snapshot:
+        snapshot_path = os.path.join(directory, snapshot.FILENAME)
+        sources = snapshot.fingerprint(directory, CSV_FILES)
+        loaded = snapshot.read(snapshot_path, sources)
+        if loaded is not None:
+            graph, people_loaded, movies_loaded, dropped = loaded
+            people.update(people_loaded)
+            movies.update(movies_loaded)
+            for person_id, person in people.items():
+                names.setdefault(person["name"].lower(), set()).add(person_id)
+            name_index = None
+            rows = graph.n_people + graph.n_movies + graph.n_edges
+            return load_stats("snapshot", rows, start, dropped)
+
+    read_rows = ingest.PARSERS[parser]
+    rows = 0
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
+    with open(f"{directory}/people.csv", encoding="utf-8", newline="") as f:
+        for person_id, name, birth in read_rows(f, ("id", "name", "birth")):
+            rows += 1
+            name = sys.intern(name)
+            people[person_id] = {
+                "name": name,
+                "birth": sys.intern(birth)
             }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
+            key = name.lower()
+            person_ids = names.get(key)
+            if person_ids is None:
+                names[key] = {person_id}
             else:
-                names[row["name"].lower()].add(row["id"])
+                person_ids.add(person_id)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
+    with open(f"{directory}/movies.csv", encoding="utf-8", newline="") as f:
+        for movie_id, title, year in read_rows(f, ("id", "title", "year")):
+            rows += 1
+            movies[movie_id] = {
+                "title": title,
+                "year": sys.intern(year)
             }
 
+    person_ids = list(people)
+    movie_ids = list(movies)
+    person_index = {pid: i for i, pid in enumerate(person_ids)}
+    movie_index = {mid: i for i, mid in enumerate(movie_ids)}
+
     # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    edge_people = array("i")
+    edge_movies = array("i")
+    with open(f"{directory}/stars.csv", encoding="utf-8", newline="") as f:
+        for person_id, movie_id in read_rows(f, ("person_id", "movie_id")):
+            rows += 1
+            p = person_index.get(person_id)
+            if p is None:
+                dropped["unknown_person"] += 1
+                continue
+            m = movie_index.get(movie_id)
+            if m is None:
+                dropped["unknown_movie"] += 1
+                continue
+            edge_people.append(p)
+            edge_movies.append(m)
+
+    graph = ActorGraph.from_edges(person_ids, movie_ids, edge_people, edge_movies,
+                                  person_index, movie_index)
+    dropped["duplicate"] = len(edge_people) - graph.n_edges
+    name_index = None
+
+    if use_snapshot:
+        try:
+            snapshot.write(snapshot_path, sources, graph, people, movies, dropped)
+        except OSError:
+            # a read-only data directory just means no cache
+            pass
+
+    return load_stats("csv", rows, start, dropped)
+
+
+def load_stats(source, rows, start, dropped):
+    """Summarize a load_data run that started at perf_counter() `start`."""
+    seconds = time.perf_counter() - start
+    return {
+        "source": source,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else 0.0,
+        "dropped": dropped
+    }
+
+
+def load_landmarks(directory):
+    """
+    Load the landmark index built for the data in `directory`.
+    Return True if a matching index was found.
+    """
+    global landmark_index
+    path = os.path.join(directory, landmarks.FILENAME)
+    landmark_index = landmarks.load(path, snapshot.fingerprint(directory, CSV_FILES))
+    return landmark_index is not None
 
 
 def main():
@@ -59,8 +164,11 @@ def main():
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    stats = load_data(directory)
     print("Data loaded.")
+    dropped = sum(stats["dropped"].values())
+    if dropped:
+        print(f"Skipped {dropped} invalid or repeated star rows.")
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,22 +177,38 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, strategy="bidirectional")
 
     if path is None:
         print("Not connected.")
     else:
         degrees = len(path)
         print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        for i, step in enumerate(describe_path(source, path)):
+            print(f"{i + 1}: {step}")
+
+
+def describe_path(source, path):
+    """
+    Return one "<person> and <person> starred in <movie>" sentence
+    for every step of `path`, which starts at person `source`.
+    """
+    path = [(None, source)] + path
+    steps = []
+    for i in range(len(path) - 1):
+        person1 = people[path[i][1]]["name"]
+        person2 = people[path[i + 1][1]]["name"]
+        movie = movies[path[i + 1][0]]["title"]
+        steps.append(f"{person1} and {person2} starred in {movie}")
+    return steps
 
 
 class Actor:
+    """
+    Search node. `actor_id` and `movie_id` are person and movie indexes
+    of the module level `graph`.
+    """
+
     def __init__(self, actor_id, movie_id=None, parent=None):
         self.actor_id = actor_id
         self.movie_id = movie_id
@@ -92,9 +216,7 @@ class Actor:
         self.state = self.movie_id, self.actor_id
 
     def connected_actors(self):
-        for mid in people[self.actor_id]["movies"]:
-            for aid in movies[mid]["stars"]:
-                yield aid, mid
+        return graph.co_stars(self.actor_id)
 
     def choose_actor(self, actor_id, movie_id):
         return Actor(actor_id, movie_id, self)
@@ -103,10 +225,11 @@ class Actor:
 def unfold_actor_chain(final_node):
     """Accepts a Actor object and unfolds all linked "parent" actors back to the first actor"""
 
-    # create list of linked actors
+    # create list of linked actors, translating graph indexes back to ids
     output_list = []
     while final_node.parent:
-        output_list.append(final_node.state)
+        output_list.append((graph.movie_ids[final_node.movie_id],
+                            graph.person_ids[final_node.actor_id]))
         final_node = final_node.parent
 
     # reverse list so that the first actor is also the first entry
@@ -122,52 +245,284 @@ def unfold_actor_chain(final_node):
     return output_list
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, strategy="bfs", stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    `strategy` selects the search: "bfs" expands from the source only,
+    "bidirectional" grows breadth-first from both ends and meets in the
+    middle, "alt" is the bidirectional search pruned with the distance
+    bounds of the landmark index loaded with `load_landmarks`.
+
+    If `stats` is a dict, it is filled with the effort of the search:
+    nodes_expanded, edges_scanned, frontier_peak and seconds.
+
     If no possible path, returns None.
     """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown search strategy: {strategy}")
+    if stats is None:
+        stats = {}
+    stats.update(nodes_expanded=0, edges_scanned=0, frontier_peak=0, seconds=0.0)
 
-    frontier = [Actor(source)]
-    seen = []
+    if source == target:
+        return []
 
-    final_node = None
-    target_found = False
-    while not target_found and frontier:
-        node = frontier.pop(0)
+    start = time.perf_counter()
+    try:
+        return STRATEGIES[strategy](graph.person_index[source],
+                                    graph.person_index[target], stats)
+    finally:
+        stats["seconds"] = time.perf_counter() - start
 
-        if node.state in seen:
-            continue
 
-        seen.append(node.state)
+def breadth_first_shortest_path(source, target, stats):
+    """
+    Breadth-first search from `source` to `target` (person indexes of
+    `graph`), counting the search effort into `stats`.
+    """
 
-        for aid, mid in node.connected_actors():
+    # frontier and explored set are both constant time per operation;
+    # actors are marked as explored when they are enqueued, so every actor
+    # enters the frontier at most once
+    frontier = QueueFrontier()
+    frontier.add(Actor(source))
+    explored = {source}
 
-            node_new = node.choose_actor(aid, mid)
+    expanded, scanned, peak = 0, 0, 1
+    try:
+        while not frontier.empty():
+            node = frontier.remove()
+            expanded += 1
 
-            if aid == target:
-                print("match found!")
-                final_node = node_new
-                target_found = True
-                break
+            for aid, mid in node.connected_actors():
+                scanned += 1
 
-            frontier.append(node_new)
+                if aid in explored:
+                    continue
+
+                node_new = node.choose_actor(aid, mid)
+
+                if aid == target:
+                    return unfold_actor_chain(node_new)
+
+                explored.add(aid)
+                frontier.add(node_new)
+
+            if len(frontier) > peak:
+                peak = len(frontier)
 
-    if final_node:
-        return unfold_actor_chain(final_node)
-    else:
         return None
+    finally:
+        stats.update(nodes_expanded=expanded, edges_scanned=scanned, frontier_peak=peak)
+
+
+def bidirectional_shortest_path(source, target, stats, keep=None):
+    """
+    Breadth-first search from `source` and `target` at the same time.
+
+    Each round expands one complete layer of the smaller side. As soon as a
+    layer touches a person already reached from the other side, the best
+    meeting point of that layer gives a shortest path, which is returned in
+    the same format as `unfold_actor_chain`.
+
+    `keep` is an optional pair of functions (forward, backward) called as
+    keep(person, depth) for every person newly reached from the source or
+    the target side. People they reject are not added to the search; they
+    must never reject a person on a shortest path.
+
+    `source` and `target` are person indexes of `graph`; the search effort
+    is counted into `stats`.
+    """
+
+    # person -> (movie, person one step closer to the own root)
+    parents_forward = {source: None}
+    parents_backward = {target: None}
+    depth_forward = {source: 0}
+    depth_backward = {target: 0}
+    layer_forward = [source]
+    layer_backward = [target]
+
+    keep_forward, keep_backward = keep if keep is not None else (None, None)
+
+    expanded, scanned, peak = 0, 0, 2
+    try:
+        while layer_forward and layer_backward:
+
+            # always grow the side with fewer people in its current layer
+            if len(layer_forward) <= len(layer_backward):
+                layer, parents, depth = layer_forward, parents_forward, depth_forward
+                other_depth, keep_person = depth_backward, keep_forward
+            else:
+                layer, parents, depth = layer_backward, parents_backward, depth_backward
+                other_depth, keep_person = depth_forward, keep_backward
+
+            next_layer = []
+            meeting = None
+            meeting_length = None
+            for person in layer:
+                expanded += 1
+                for aid, mid in graph.co_stars(person):
+                    scanned += 1
+                    if aid in parents:
+                        continue
+                    if keep_person is not None and not keep_person(aid, depth[person] + 1):
+                        # never look at this person again from this side
+                        parents[aid] = None
+                        continue
+                    parents[aid] = (mid, person)
+                    depth[aid] = depth[person] + 1
+                    next_layer.append(aid)
+
+                    if aid in other_depth:
+                        length = depth[aid] + other_depth[aid]
+                        if meeting is None or length < meeting_length:
+                            meeting, meeting_length = aid, length
+
+            if meeting is not None:
+                return join_half_paths(meeting, parents_forward, parents_backward)
+
+            if layer is layer_forward:
+                layer_forward = next_layer
+            else:
+                layer_backward = next_layer
+
+            if len(layer_forward) + len(layer_backward) > peak:
+                peak = len(layer_forward) + len(layer_backward)
+
+        return None
+    finally:
+        stats.update(nodes_expanded=expanded, edges_scanned=scanned, frontier_peak=peak)
+
+
+def landmark_shortest_path(source, target, stats):
+    """
+    Bidirectional breadth-first search from `source` to `target` (person
+    indexes of `graph`) pruned with the landmark index, counting the
+    search effort into `stats`.
+
+    The landmarks give an upper bound U on the distance between `source`
+    and `target`, and for every person p lower bounds on their distance to
+    either end. A person reached at depth k from one side with
+    k + lower bound to the other end > U cannot lie on a shortest path
+    and is not expanded. People the landmarks prove disconnected from the
+    target end the search at once.
+
+    Computing the bounds costs time per reached person, so this only beats
+    the plain "bidirectional" strategy when the bounds are tight, e.g. on
+    graphs with long shortest paths.
+    """
+    if landmark_index is None:
+        raise ValueError("The alt strategy needs a landmark index, see load_landmarks")
+
+    lower, upper = landmark_index.bounds(source, target)
+    if lower == math.inf:
+        stats.update(nodes_expanded=0, edges_scanned=0, frontier_peak=0)
+        return None
+    if upper is None:
+        return bidirectional_shortest_path(source, target, stats)
+
+    to_target = landmark_index.heuristic(source, target)
+    to_source = landmark_index.heuristic(target, source)
+    keep = (
+        lambda person, depth: depth + to_target(person) <= upper,
+        lambda person, depth: depth + to_source(person) <= upper,
+    )
+    return bidirectional_shortest_path(source, target, stats, keep)
+
+
+def join_half_paths(meeting, parents_forward, parents_backward):
+    """
+    Combine the parent chains of both search directions, which meet at
+    person `meeting`, into a list of (movie_id, person_id) pairs.
+    """
+    person_ids = graph.person_ids
+    movie_ids = graph.movie_ids
+
+    path = []
+    person = meeting
+    while parents_forward[person]:
+        movie, previous = parents_forward[person]
+        path.append((movie_ids[movie], person_ids[person]))
+        person = previous
+    path.reverse()
+
+    person = meeting
+    while parents_backward[person]:
+        movie, following = parents_backward[person]
+        path.append((movie_ids[movie], person_ids[following]))
+        person = following
+
+    return path
+
+
+def single_source_distances(source):
+    """
+    Returns the degrees of separation between `source` and every person
+    connected to it, computed in one breadth-first pass over the graph.
+
+    Returns (distances, parents): distances maps person_id to its number
+    of degrees, parents maps every person_id except `source` to the
+    (movie_id, person_id) step one degree closer to `source`.
+    """
+    graph_distances, parent_people, parent_movies = graph.single_source_bfs(
+        graph.person_index[source])
+
+    person_ids = graph.person_ids
+    movie_ids = graph.movie_ids
+    distances = {}
+    parents = {}
+    for p, distance in enumerate(graph_distances):
+        if distance == -1:
+            continue
+        distances[person_ids[p]] = distance
+        if distance > 0:
+            parents[person_ids[p]] = (movie_ids[parent_movies[p]],
+                                      person_ids[parent_people[p]])
+    return distances, parents
+
+
+STRATEGIES = {
+    "bfs": breadth_first_shortest_path,
+    "bidirectional": bidirectional_shortest_path,
+    "alt": landmark_shortest_path,
+}
+
+
+def distance_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two person_ids from the landmark index, without searching the graph.
+
+    lower is math.inf if the two are provably not connected, upper is None
+    if no landmark is connected to both.
+    """
+    if landmark_index is None:
+        raise ValueError("No landmark index loaded, see load_landmarks")
+    return landmark_index.bounds(graph.person_index[source], graph.person_index[target])
 
 
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    Without an exact match, the closest names from `name_lookup` are
+    offered instead.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
+        person_ids = suggest_person_ids(name)
+        if len(person_ids) == 0:
+            return None
+        print(f"No exact match for '{name}'. Did you mean:")
+        for person_id in person_ids:
+            person = people[person_id]
+            print(f"ID: {person_id}, Name: {person['name']}, Birth: {person['birth']}")
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
@@ -187,16 +542,35 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def suggest_person_ids(name, limit=10):
+    """
+    Returns up to `limit` person_ids whose names start with or resemble
+    `name`, best match first.
+    """
+    if not names:
+        return []
+    person_ids = []
+    for _, ids in name_lookup().search(name, limit):
+        person_ids.extend(sorted(ids))
+    return person_ids[:limit]
+
+
+def name_lookup():
+    """Return the NameIndex over `names`, building it on first use."""
+    global name_index
+    if name_index is None:
+        name_index = NameIndex(names)
+    return name_index
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for p, m in graph.co_stars(graph.person_index[person_id]):
+        neighbors.add((graph.movie_ids[m], graph.person_ids[p]))
     return neighbors
 
 
@@ -0,0 +1,189 @@
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import os
+import sys
+
+import degrees
+import landmarks
+import snapshot
+from service import resolve_person
+
+
+def write_distance_table(source, outfile):
+    """
+    Write "person_id,name,distance" rows for every person connected to
+    `source` ("Bacon numbers"), ordered by distance.
+    """
+    distances, _ = degrees.single_source_distances(source)
+    writer = csv.writer(outfile)
+    writer.writerow(["person_id", "name", "distance"])
+    for person_id, distance in sorted(distances.items(), key=lambda item: item[1]):
+        writer.writerow([person_id, degrees.people[person_id]["name"], distance])
+
+
+def distance_histogram(source):
+    """
+    Return (source, histogram, unreachable) for person index `source`:
+    histogram[d] is the number of people at distance d.
+
+    Runs inside the worker processes. It only reads the module level
+    graph, which forked workers share with the parent without copying.
+    """
+    distances, _, _ = degrees.graph.single_source_bfs(source)
+    histogram = []
+    unreachable = 0
+    for distance in distances:
+        if distance == -1:
+            unreachable += 1
+            continue
+        while len(histogram) <= distance:
+            histogram.append(0)
+        histogram[distance] += 1
+    return source, histogram, unreachable
+
+
+def highest_degree_people(n):
+    """Return the indexes of the `n` people with the most movies."""
+    offsets = degrees.graph.person_offsets
+    return sorted(range(degrees.graph.n_people),
+                  key=lambda p: offsets[p + 1] - offsets[p], reverse=True)[:n]
+
+
+def landmark_row(source):
+    """
+    Return (source, distance row) for the landmark person index `source`.
+    Runs inside the worker processes, like `distance_histogram`.
+    """
+    distances, _, _ = degrees.graph.single_source_bfs(source)
+    return source, landmarks.distance_row(distances)
+
+
+def map_sources(function, sources, processes=None):
+    """
+    Yield function(source) for every person index in `sources`, in
+    completion order.
+
+    Sources are fanned out over a pool of forked processes, so the graph
+    loaded by the parent is inherited rather than pickled to each worker.
+    Without fork support (e.g. on Windows) the sources run one by one.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        with context.Pool(processes) as pool:
+            yield from pool.imap_unordered(function, sources)
+    else:
+        yield from map(function, sources)
+
+
+def write_histograms(sources, outfile, processes=None):
+    """
+    Compute the distance histogram of every person index in `sources`
+    and write one JSON line per source as soon as it is done.
+    """
+    results = map_sources(distance_histogram, sources, processes)
+    write_histogram_lines(degrees.graph, results, outfile)
+
+
+def build_landmarks(directory, n, processes=None):
+    """
+    Run a BFS from each of the `n` people with the most movies and save
+    the distances as the landmark index of `directory`.
+    Return the path of the index file.
+    """
+    sources = highest_degree_people(n)
+    rows = dict(map_sources(landmark_row, sources, processes))
+    path = os.path.join(directory, landmarks.FILENAME)
+    landmarks.save(path, snapshot.fingerprint(directory, degrees.CSV_FILES),
+                   sources, [rows[source] for source in sources])
+    return path
+
+
+def write_histogram_lines(graph, results, outfile):
+    """Write one JSON line per (source, histogram, unreachable) result."""
+    for source, histogram, unreachable in results:
+        person_id = graph.person_ids[source]
+        outfile.write(json.dumps({
+            "source_id": person_id,
+            "name": degrees.people[person_id]["name"],
+            "histogram": histogram,
+            "unreachable": unreachable
+        }) + "\n")
+        outfile.flush()
+
+
+def person_id_or_exit(name):
+    """Resolve a name or person id, exiting with the error if that fails."""
+    person_id, error = resolve_person(name)
+    if error is not None:
+        sys.exit(error)
+    return person_id
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute degrees of separation from one or many people.")
+    parser.add_argument("directory", nargs="?", default="large")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--source", metavar="NAME",
+                      help="write the distance from this person to everyone")
+    mode.add_argument("--sources", metavar="FILE",
+                      help="file with one name or id per line, write a distance histogram for each")
+    mode.add_argument("--top", metavar="N", type=int,
+                      help="write distance histograms for the N people with the most movies")
+    mode.add_argument("--build-landmarks", metavar="N", type=int,
+                      help="build a landmark index from the N people with the most movies")
+    mode.add_argument("--bounds", metavar="NAME", nargs=2,
+                      help="print landmark distance bounds between two people")
+    parser.add_argument("--output", metavar="FILE", default="-",
+                        help="output file, - for stdout (default)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes for histograms and landmarks (default: all cores)")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory)
+    print("Data loaded.", file=sys.stderr)
+
+    if args.build_landmarks is not None:
+        path = build_landmarks(args.directory, args.build_landmarks, args.processes)
+        print(f"Landmark index written to {path}", file=sys.stderr)
+        return
+    if args.bounds is not None:
+        if not degrees.load_landmarks(args.directory):
+            sys.exit("No landmark index for this data, run with --build-landmarks first.")
+        source, target = (person_id_or_exit(name) for name in args.bounds)
+        lower, upper = degrees.distance_bounds(source, target)
+        if lower == math.inf:
+            print("Not connected.")
+        else:
+            print(f"Between {lower} and {'?' if upper is None else upper} degrees of separation.")
+        return
+
+    if args.source is not None:
+        source = person_id_or_exit(args.source)
+    elif args.sources is not None:
+        with open(args.sources, encoding="utf-8") as f:
+            sources = [degrees.graph.person_index[person_id_or_exit(line.strip())]
+                       for line in f if line.strip()]
+    else:
+        sources = highest_degree_people(args.top)
+
+    if args.output == "-":
+        outfile = sys.stdout
+    else:
+        outfile = open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        if args.source is not None:
+            write_distance_table(source, outfile)
+        else:
+            write_histograms(sources, outfile, args.processes)
+    finally:
+        if outfile is not sys.stdout:
+            outfile.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import sys
+from array import array
+
+
+class ActorGraph():
+    """
+    Compact bipartite graph of people and movies.
+
+    People and movies are interned to consecutive integer indexes. The
+    adjacency is stored in CSR form: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]` and the stars
+    of movie `m` are `movie_stars[movie_offsets[m]:movie_offsets[m + 1]]`.
+    All four are flat integer arrays instead of one set per person/movie.
+    """
+
+    def __init__(self, person_ids, movie_ids,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 person_index=None, movie_index=None):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        if person_index is None:
+            person_index = {pid: i for i, pid in enumerate(person_ids)}
+        if movie_index is None:
+            movie_index = {mid: i for i, mid in enumerate(movie_ids)}
+        self.person_index = person_index
+        self.movie_index = movie_index
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+    @classmethod
+    def from_edges(cls, person_ids, movie_ids, edge_people, edge_movies,
+                   person_index=None, movie_index=None):
+        """
+        Build the graph from two parallel arrays of person and movie
+        indexes, one entry per star row. Duplicate rows are dropped.
+        """
+        person_offsets, person_movies = group_by(len(person_ids), edge_people, edge_movies)
+        person_offsets, person_movies = drop_duplicates(person_offsets, person_movies)
+
+        # transposing the deduplicated person -> movies adjacency gives a
+        # movie -> stars adjacency without duplicates as well
+        edge_people = array("i", [0]) * len(person_movies)
+        for p in range(len(person_ids)):
+            for k in range(person_offsets[p], person_offsets[p + 1]):
+                edge_people[k] = p
+        movie_offsets, movie_stars = group_by(len(movie_ids), person_movies, edge_people)
+
+        return cls(person_ids, movie_ids,
+                   person_offsets, person_movies, movie_offsets, movie_stars,
+                   person_index, movie_index)
+
+    @property
+    def n_people(self):
+        return len(self.person_ids)
+
+    @property
+    def n_movies(self):
+        return len(self.movie_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.person_movies)
+
+    def movies_of(self, p):
+        """Return the movie indexes person `p` starred in."""
+        return self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+
+    def stars_of(self, m):
+        """Return the person indexes that starred in movie `m`."""
+        return self.movie_stars[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+
+    def co_stars(self, p):
+        """Yield (person index, movie index) for everyone who starred with `p`."""
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        for k in range(self.person_offsets[p], self.person_offsets[p + 1]):
+            m = person_movies[k]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                yield movie_stars[j], m
+
+    def single_source_bfs(self, source):
+        """
+        Breadth-first search from person `source` over the whole graph.
+
+        Return three arrays indexed by person: the distance from `source`,
+        and the previous person and shared movie on a shortest path from
+        `source`. All three are -1 for unreachable people; the parents are
+        -1 for `source` itself.
+        """
+        distances = array("i", [-1]) * self.n_people
+        parent_people = array("i", [-1]) * self.n_people
+        parent_movies = array("i", [-1]) * self.n_people
+        distances[source] = 0
+
+        layer = [source]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for person in layer:
+                for aid, mid in self.co_stars(person):
+                    if distances[aid] == -1:
+                        distances[aid] = depth
+                        parent_people[aid] = person
+                        parent_movies[aid] = mid
+                        next_layer.append(aid)
+            layer = next_layer
+
+        return distances, parent_people, parent_movies
+
+    def nbytes(self):
+        """
+        Return the approximate number of bytes held by the graph,
+        including the id tables and the id -> index dicts.
+        """
+        arrays = (self.person_offsets, self.person_movies,
+                  self.movie_offsets, self.movie_stars)
+        total = sum(a.itemsize * len(a) for a in arrays)
+        for ids in (self.person_ids, self.movie_ids):
+            total += sys.getsizeof(ids) + sum(sys.getsizeof(i) for i in ids)
+        total += sys.getsizeof(self.person_index) + sys.getsizeof(self.movie_index)
+        return total
+
+
+def group_by(n_keys, keys, values):
+    """
+    Counting sort of `values` by `keys` (both integer arrays).
+    Return (offsets, grouped values) in CSR form.
+    """
+    offsets = array("i", [0]) * (n_keys + 1)
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(n_keys):
+        offsets[i + 1] += offsets[i]
+
+    grouped = array("i", [0]) * len(values)
+    position = array("i", offsets[:-1])
+    for key, value in zip(keys, values):
+        grouped[position[key]] = value
+        position[key] += 1
+
+    return offsets, grouped
+
+
+def drop_duplicates(offsets, grouped):
+    """
+    Remove repeated values inside every CSR row.
+    Return the (possibly) compacted (offsets, grouped) pair.
+    """
+    n_rows = len(offsets) - 1
+    if all(len(set(grouped[offsets[i]:offsets[i + 1]])) == offsets[i + 1] - offsets[i]
+           for i in range(n_rows)):
+        return offsets, grouped
+
+    new_offsets = array("i", [0])
+    new_grouped = array("i")
+    for i in range(n_rows):
+        new_grouped.extend(sorted(set(grouped[offsets[i]:offsets[i + 1]])))
+        new_offsets.append(len(new_grouped))
+
+    return new_offsets, new_grouped
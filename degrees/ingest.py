@@ -0,0 +1,63 @@
+import csv
+from operator import itemgetter
+
+# Number of characters read at once by the chunked parser
+CHUNK_SIZE = 1 << 20
+
+
+def dict_rows(f, columns):
+    """
+    Yield a tuple of the requested `columns` for every row of the CSV
+    file `f`, using csv.DictReader. Allocates one dict per row.
+    """
+    for row in csv.DictReader(f):
+        yield tuple(row[column] for column in columns)
+
+
+def reader_rows(f, columns):
+    """
+    Yield a tuple of the requested `columns` for every row of the CSV
+    file `f`. The header is only used to find the column positions, rows
+    are read with csv.reader and picked by index.
+    """
+    reader = csv.reader(f)
+    pick = picker(next(reader, []), columns)
+    for row in reader:
+        if row:
+            yield pick(row)
+
+
+def chunked_rows(f, columns):
+    """
+    Like `reader_rows`, but reads the file in blocks of about CHUNK_SIZE
+    characters and parses each block in one go. Fields must not contain
+    line breaks, which holds for the IMDb exports.
+    """
+    header = next(csv.reader([f.readline()]), [])
+    pick = picker(header, columns)
+    while True:
+        lines = f.readlines(CHUNK_SIZE)
+        if not lines:
+            break
+        for row in csv.reader(lines):
+            if row:
+                yield pick(row)
+
+
+def picker(header, columns):
+    """Return a function selecting `columns` from a row laid out as `header`."""
+    try:
+        indexes = [header.index(column) for column in columns]
+    except ValueError:
+        raise ValueError(f"CSV header {header} lacks one of the columns {columns}")
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda row: (row[index],)
+    return itemgetter(*indexes)
+
+
+PARSERS = {
+    "dict": dict_rows,
+    "reader": reader_rows,
+    "chunked": chunked_rows,
+}
@@ -0,0 +1,154 @@
+import json
+import math
+import mmap
+import os
+import struct
+from array import array
+
+FILENAME = "degrees.landmarks"
+
+MAGIC = b"DEGLMK1\0"
+
+# Distances are stored as one unsigned byte per (landmark, person)
+UNREACHABLE = 255
+
+# Number of landmarks consulted by the search heuristic for one query
+ACTIVE_LANDMARKS = 8
+
+
+class LandmarkIndex():
+    """
+    Exact BFS distances from a set of landmark people to everyone.
+
+    `landmarks` holds person indexes of the graph, `rows[k][p]` is the
+    distance between landmark k and person p (UNREACHABLE if they are not
+    connected). By the triangle inequality every landmark L gives
+    |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t).
+    """
+
+    def __init__(self, landmarks, rows):
+        self.landmarks = landmarks
+        self.rows = rows
+
+    def bounds(self, s, t):
+        """
+        Return (lower, upper) bounds on the distance between person
+        indexes `s` and `t`. lower is math.inf if the landmarks prove that
+        `s` and `t` are not connected; upper is None if no landmark
+        reaches both of them.
+        """
+        lower = 0
+        upper = None
+        for row in self.rows:
+            ds, dt = row[s], row[t]
+            if ds == UNREACHABLE and dt == UNREACHABLE:
+                continue
+            if ds == UNREACHABLE or dt == UNREACHABLE:
+                return math.inf, None
+            lower = max(lower, abs(ds - dt))
+            if upper is None or ds + dt < upper:
+                upper = ds + dt
+        return lower, upper
+
+    def heuristic(self, s, t):
+        """
+        Return a function h(p) that never overestimates the distance from
+        person index p to `t`, for a search from `s` to `t`.
+
+        Only the ACTIVE_LANDMARKS landmarks with the best bound for (s, t)
+        are used, which keeps h cheap while staying admissible.
+        """
+        scored = []
+        for row in self.rows:
+            dt = row[t]
+            if dt == UNREACHABLE:
+                continue
+            ds = row[s]
+            score = math.inf if ds == UNREACHABLE else abs(ds - dt)
+            scored.append((score, row, dt))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        active = [(row, dt) for _, row, dt in scored[:ACTIVE_LANDMARKS]]
+
+        def h(p):
+            best = 0
+            for row, dt in active:
+                dp = row[p]
+                if dp == UNREACHABLE:
+                    return math.inf
+                diff = dp - dt if dp > dt else dt - dp
+                if diff > best:
+                    best = diff
+            return best
+
+        return h
+
+
+def distance_row(distances):
+    """
+    Convert the distance array of `ActorGraph.single_source_bfs` into a
+    byte row, with -1 stored as UNREACHABLE.
+    """
+    row = array("B", [UNREACHABLE]) * len(distances)
+    for p, distance in enumerate(distances):
+        if distance == -1:
+            continue
+        if distance >= UNREACHABLE:
+            raise ValueError(f"Distance {distance} does not fit into a landmark row")
+        row[p] = distance
+    return row
+
+
+def save(path, sources, landmarks, rows):
+    """
+    Write the landmark person indexes and their distance rows to `path`.
+    `sources` is the fingerprint of the CSV files the graph came from.
+
+    The file is written to a temporary name first and renamed into place,
+    so an interrupted build never leaves a partial index behind.
+    """
+    header = json.dumps({
+        "sources": sources,
+        "landmarks": list(landmarks),
+        "n_people": len(rows[0]) if rows else 0,
+    }).encode("utf-8")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for row in rows:
+            f.write(row.tobytes())
+    os.replace(tmp_path, path)
+
+
+def load(path, sources):
+    """
+    Memory-map the landmark file at `path`. Return a LandmarkIndex, or
+    None if there is no file, it is truncated or corrupt, or it was built
+    from different CSV files.
+    """
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if mm[:len(MAGIC)] != MAGIC:
+        return None
+    try:
+        (header_length,) = struct.unpack_from("<Q", mm, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(mm[header_start:header_start + header_length].decode("utf-8"))
+        if header["sources"] != sources:
+            return None
+        n = header["n_people"]
+        landmarks = header["landmarks"]
+    except (struct.error, ValueError, KeyError, TypeError, UnicodeDecodeError):
+        return None
+
+    start = header_start + header_length
+    if len(mm) != start + n * len(landmarks):
+        return None
+    view = memoryview(mm)
+    rows = [view[start + k * n:start + (k + 1) * n] for k in range(len(landmarks))]
+    return LandmarkIndex(landmarks, rows)
@@ -0,0 +1,137 @@
+import difflib
+from array import array
+from bisect import bisect_left
+
+# Trigrams shared by more names than this are dropped from the index and
+# only remembered as common, which bounds the index at MAX_POSTINGS
+# entries per distinct trigram
+MAX_POSTINGS = 2000
+
+# Fuzzy lookup reads the postings of the query trigrams rarest first and
+# stops before reading more than this many positions (the rarest trigram
+# is always read). Common trigrams are then checked in the candidates.
+MAX_SCANNED = 10_000
+
+# Number of trigram candidates that are re-ranked with difflib
+RERANK = 50
+
+# Smallest share of common trigrams (Dice coefficient) for a fuzzy match
+MIN_SIMILARITY = 0.4
+
+
+class NameIndex():
+    """
+    Prefix and fuzzy lookup over lowercase person names.
+
+    Names are kept sorted, so all names starting with a prefix form one
+    contiguous run found by binary search. For fuzzy lookup every name is
+    split into trigrams and each trigram maps to an array of positions of
+    the names containing it, in increasing order. Trigrams of more than
+    MAX_POSTINGS names are kept in `common` without positions, so the
+    index holds at most MAX_POSTINGS positions per distinct trigram.
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self.keys = sorted(names)
+        self.gram_counts = array("i")
+
+        postings = {}
+        common = set()
+        for position, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                positions = postings.get(gram)
+                if positions is None:
+                    if gram not in common:
+                        postings[gram] = array("i", [position])
+                elif len(positions) >= MAX_POSTINGS:
+                    # too common, stop indexing this trigram
+                    del postings[gram]
+                    common.add(gram)
+                else:
+                    positions.append(position)
+        self.postings = postings
+        self.common = common
+
+    def nbytes(self):
+        """Return the bytes held by the position arrays of the index."""
+        return (sum(positions.itemsize * len(positions) for positions in self.postings.values())
+                + self.gram_counts.itemsize * len(self.gram_counts))
+
+    def prefix(self, text, limit=10):
+        """Return up to `limit` names starting with `text`, in sorted order."""
+        text = text.lower()
+        keys = self.keys
+        start = bisect_left(keys, text)
+        matches = []
+        for i in range(start, min(start + limit, len(keys))):
+            if not keys[i].startswith(text):
+                break
+            matches.append(keys[i])
+        return matches
+
+    def fuzzy(self, text, limit=10):
+        """
+        Return up to `limit` names similar to `text`, best match first.
+
+        Candidates share at least one of the rarest indexed trigrams of
+        `text`; its common trigrams are checked in the candidate names.
+        They are ranked by the share of all trigrams they have in common
+        with `text` (Dice coefficient) and must reach MIN_SIMILARITY; the
+        best RERANK of them are ordered by difflib's similarity ratio.
+        """
+        text = text.lower()
+        grams = trigrams(text)
+        postings = self.postings
+        ranked = sorted((gram for gram in grams if gram in postings),
+                        key=lambda gram: len(postings[gram]))
+        shared = {}
+        scanned = 0
+        for n_scanned, gram in enumerate(ranked):
+            positions = postings[gram]
+            if scanned and scanned + len(positions) > MAX_SCANNED:
+                break
+            scanned += len(positions)
+            for position in positions:
+                shared[position] = shared.get(position, 0) + 1
+        else:
+            n_scanned = len(ranked)
+        if not shared:
+            return []
+
+        # trigrams too common to scan or index are looked up in the candidates
+        skipped = ranked[n_scanned:] + [gram for gram in grams if gram in self.common]
+        keys = self.keys
+        gram_counts = self.gram_counts
+        scores = {}
+        for position, count in shared.items():
+            if skipped:
+                padded = f"  {keys[position]} "
+                count += sum(gram in padded for gram in skipped)
+            scores[position] = 2 * count / (len(grams) + gram_counts[position])
+        best = sorted(scores, key=scores.get, reverse=True)[:RERANK]
+        candidates = [keys[position] for position in best
+                      if scores[position] >= MIN_SIMILARITY]
+        candidates.sort(key=lambda key: difflib.SequenceMatcher(None, text, key).ratio(),
+                        reverse=True)
+        return candidates[:limit]
+
+    def search(self, text, limit=10):
+        """
+        Return up to `limit` (name, person_ids) candidates for `text`:
+        prefix matches first, then fuzzy matches.
+        """
+        matches = self.prefix(text, limit)
+        if len(matches) < limit:
+            for key in self.fuzzy(text, limit):
+                if key not in matches:
+                    matches.append(key)
+        return [(key, self.names[key]) for key in matches[:limit]]
+
+
+def trigrams(text):
+    """Return the set of trigrams of `text`, padded to mark word starts."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
@@ -0,0 +1,233 @@
+import argparse
+import csv
+import json
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+
+# Number of complete BFS trees kept in memory for repeated sources
+TREE_CACHE_SIZE = 16
+
+# Queries from one source after which a complete BFS tree is built for it
+HOT_QUERIES = 3
+
+# Number of recently queried sources whose queries are counted
+COUNTED_SOURCES = 4096
+
+
+class PathService():
+    """
+    Answers degrees queries against the data loaded by `degrees.load_data`.
+
+    Queries are answered by bidirectional search. Once a source has been
+    queried `hot_queries` times, a complete BFS tree is built from it on a
+    background thread, one tree at a time, and kept in a small LRU cache;
+    from then on queries from that source are a walk up the tree. Queries
+    are counted for the `counted_sources` most recent sources only. The
+    service is safe to share between threads.
+    """
+
+    def __init__(self, cache_size=TREE_CACHE_SIZE, hot_queries=HOT_QUERIES,
+                 counted_sources=COUNTED_SOURCES):
+        self.cache_size = cache_size
+        self.hot_queries = hot_queries
+        self.counted_sources = counted_sources
+        self.trees = OrderedDict()
+        self.source_counts = OrderedDict()
+        self.building = None
+        self.lock = threading.Lock()
+
+    def shortest_path(self, source, target):
+        """Same contract as `degrees.shortest_path`, reusing cached BFS trees."""
+        graph = degrees.graph
+        s = graph.person_index[source]
+        t = graph.person_index[target]
+
+        tree = self.tree_for(s)
+        if tree is None:
+            return degrees.shortest_path(source, target, strategy="bidirectional")
+
+        parent_people, parent_movies = tree
+        if s == t:
+            return []
+        if parent_people[t] == -1:
+            return None
+        path = []
+        person = t
+        while person != s:
+            path.append((graph.movie_ids[parent_movies[person]], graph.person_ids[person]))
+            person = parent_people[person]
+        path.reverse()
+        return path
+
+    def tree_for(self, s):
+        """
+        Return the cached BFS tree of person index `s`, or None if there is
+        none yet. Count the query, and start building the tree once `s` is
+        hot and no other tree is being built.
+        """
+        with self.lock:
+            if s in self.trees:
+                self.trees.move_to_end(s)
+                return self.trees[s]
+            count = self.source_counts.pop(s, 0) + 1
+            self.source_counts[s] = count
+            while len(self.source_counts) > self.counted_sources:
+                self.source_counts.popitem(last=False)
+            if count < self.hot_queries or self.building is not None:
+                return None
+            self.building = s
+
+        threading.Thread(target=self.build_tree, args=(s,), daemon=True).start()
+        return None
+
+    def build_tree(self, s):
+        """Build the BFS tree of person index `s` and add it to the cache."""
+        tree = None
+        try:
+            _, parent_people, parent_movies = degrees.graph.single_source_bfs(s)
+            tree = parent_people, parent_movies
+        finally:
+            with self.lock:
+                self.building = None
+                if tree is not None:
+                    self.trees[s] = tree
+                    self.source_counts.pop(s, None)
+                    while len(self.trees) > self.cache_size:
+                        self.trees.popitem(last=False)
+
+    def query(self, source_name, target_name):
+        """
+        Answer one query by names. Return a JSON-serializable dict with
+        the resolved ids, the degrees and path, or an error message.
+        """
+        result = {"source": source_name, "target": target_name}
+        source, error = resolve_person(source_name)
+        if error is None:
+            target, error = resolve_person(target_name)
+        if error is not None:
+            result["error"] = error
+            return result
+
+        path = self.shortest_path(source, target)
+        result["source_id"] = source
+        result["target_id"] = target
+        if path is None:
+            result["degrees"] = None
+        else:
+            result["degrees"] = len(path)
+            result["path"] = [list(step) for step in path]
+            result["steps"] = degrees.describe_path(source, path)
+        return result
+
+
+def resolve_person(name):
+    """
+    Non-interactive counterpart of `degrees.person_id_for_name`.
+
+    `name` may also be a person id, which is how callers pick one of
+    several people with the same name. Return (person_id, None) or
+    (None, error message).
+    """
+    if name in degrees.people:
+        return name, None
+    person_ids = sorted(degrees.names.get(name.lower(), set()))
+    if len(person_ids) == 0:
+        suggestions = degrees.suggest_person_ids(name, limit=5)
+        if suggestions:
+            candidates = ", ".join(f"{degrees.people[pid]['name']} ({pid})" for pid in suggestions)
+            return None, f"Person not found: {name}. Did you mean: {candidates}"
+        return None, f"Person not found: {name}"
+    if len(person_ids) > 1:
+        return None, f"Ambiguous name {name}, use one of the ids {', '.join(person_ids)}"
+    return person_ids[0], None
+
+
+def run_batch(service, infile, outfile):
+    """
+    Read `source,target` name pairs as CSV rows from `infile` and write one
+    JSON result per line to `outfile` as soon as it is answered.
+    """
+    for row in csv.reader(infile):
+        if not row:
+            continue
+        if len(row) != 2:
+            result = {"error": f"Expected source,target but got {row}"}
+        else:
+            result = service.query(row[0].strip(), row[1].strip())
+        outfile.write(json.dumps(result) + "\n")
+        outfile.flush()
+
+
+def make_handler(service):
+    """Return a request handler class answering GET /path?source=...&target=..."""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if url.path != "/path":
+                self.send_json(404, {"error": "Unknown endpoint, use /path"})
+            elif "source" not in params or "target" not in params:
+                self.send_json(400, {"error": "Both source and target are required"})
+            else:
+                self.send_json(200, service.query(params["source"][0], params["target"][0]))
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def serve(service, host, port):
+    """Answer HTTP queries until interrupted, one thread per request."""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving on http://{host}:{server.server_port}/path?source=...&target=...",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer many degrees queries with the data loaded once.")
+    parser.add_argument("directory", nargs="?", default="large")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--batch", metavar="FILE",
+                      help="CSV file of source,target name pairs, - for stdin")
+    mode.add_argument("--serve", metavar="PORT", type=int,
+                      help="serve HTTP queries on this port")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to bind in --serve mode")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory)
+    print("Data loaded.", file=sys.stderr)
+
+    service = PathService()
+    if args.serve is not None:
+        serve(service, args.host, args.serve)
+    elif args.batch == "-":
+        run_batch(service, sys.stdin, sys.stdout)
+    else:
+        with open(args.batch, newline="", encoding="utf-8") as f:
+            run_batch(service, f, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
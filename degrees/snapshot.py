@@ -0,0 +1,193 @@
+import json
+import mmap
+import os
+import struct
+import sys
+
+from graph import ActorGraph
+
+FILENAME = "degrees.snapshot"
+
+MAGIC = b"DEGSNAP1"
+VERSION = 2
+
+# Integer sections hold the CSR arrays of the graph, string sections hold
+# "\0"-separated UTF-8 tables aligned with the person and movie indexes
+INT_SECTIONS = ("person_offsets", "person_movies", "movie_offsets", "movie_stars")
+STR_SECTIONS = ("person_ids", "person_names", "person_births",
+                "movie_ids", "movie_titles", "movie_years")
+
+ALIGNMENT = 8
+
+
+def fingerprint(directory, filenames):
+    """
+    Return {filename: [mtime_ns, size]} for the given files in `directory`.
+    A snapshot is only valid for exactly this fingerprint.
+    """
+    sources = {}
+    for filename in filenames:
+        stat = os.stat(os.path.join(directory, filename))
+        sources[filename] = [stat.st_mtime_ns, stat.st_size]
+    return sources
+
+
+def write(path, sources, graph, people, movies, dropped):
+    """
+    Write `graph` together with the `people` and `movies` records to the
+    snapshot file `path`. `sources` is the fingerprint of the CSV files
+    the data was parsed from, `dropped` counts the star rows skipped while
+    parsing them by reason.
+
+    The file is written to a temporary name first and renamed into place,
+    so a concurrent reader never sees a partial snapshot.
+    """
+    person_ids = graph.person_ids
+    movie_ids = graph.movie_ids
+    sections = {
+        "person_offsets": graph.person_offsets,
+        "person_movies": graph.person_movies,
+        "movie_offsets": graph.movie_offsets,
+        "movie_stars": graph.movie_stars,
+        "person_ids": person_ids,
+        "person_names": [people[pid]["name"] for pid in person_ids],
+        "person_births": [people[pid]["birth"] for pid in person_ids],
+        "movie_ids": movie_ids,
+        "movie_titles": [movies[mid]["title"] for mid in movie_ids],
+        "movie_years": [movies[mid]["year"] for mid in movie_ids],
+    }
+
+    blobs = {}
+    for name in INT_SECTIONS:
+        blobs[name] = sections[name].tobytes()
+    for name in STR_SECTIONS:
+        blobs[name] = "\0".join(sections[name]).encode("utf-8")
+
+    # section offsets are relative to the start of the data area
+    layout = {}
+    position = 0
+    for name in INT_SECTIONS + STR_SECTIONS:
+        layout[name] = [position, len(blobs[name])]
+        position += aligned(len(blobs[name]))
+
+    header = json.dumps({
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "itemsize": graph.person_offsets.itemsize,
+        "sources": sources,
+        "n_people": len(person_ids),
+        "n_movies": len(movie_ids),
+        "dropped": dropped,
+        "sections": layout,
+    }).encode("utf-8")
+    data_start = aligned(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(bytes(data_start - f.tell()))
+        for name in INT_SECTIONS + STR_SECTIONS:
+            blob = blobs[name]
+            f.write(blob)
+            f.write(bytes(aligned(len(blob)) - len(blob)))
+    os.replace(tmp_path, path)
+
+
+def read(path, sources):
+    """
+    Memory-map the snapshot file `path`.
+
+    Return (graph, people, movies, dropped), or None if there is no snapshot, it is
+    truncated or corrupt, or it was written for different CSV files, a
+    different format version or a machine with a different integer
+    layout. The graph arrays are views into the mapped file, so they are
+    paged in lazily.
+    """
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        loaded = read_sections(mm, sources)
+    except (struct.error, ValueError, KeyError, TypeError, AttributeError,
+            UnicodeDecodeError):
+        # truncated or corrupt file: fall back to the CSV files
+        return None
+    if loaded is None:
+        return None
+    sections, dropped = loaded
+
+    graph = ActorGraph(sections["person_ids"], sections["movie_ids"],
+                       sections["person_offsets"], sections["person_movies"],
+                       sections["movie_offsets"], sections["movie_stars"])
+    people = {
+        pid: {"name": name, "birth": birth}
+        for pid, name, birth in zip(sections["person_ids"],
+                                    sections["person_names"],
+                                    sections["person_births"])
+    }
+    movies = {
+        mid: {"title": title, "year": year}
+        for mid, title, year in zip(sections["movie_ids"],
+                                    sections["movie_titles"],
+                                    sections["movie_years"])
+    }
+    return graph, people, movies, dropped
+
+
+def read_sections(mm, sources):
+    """
+    Return the sections of the mapped snapshot `mm` by name together with
+    its dropped star row counts, or None if it is not a snapshot for
+    `sources` in this format. Raise ValueError if a
+    section lies outside the file or does not hold the expected number of
+    entries; malformed headers raise struct.error, ValueError or KeyError.
+    """
+    if mm[:len(MAGIC)] != MAGIC:
+        return None
+    (header_length,) = struct.unpack_from("<Q", mm, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    if header_start + header_length > len(mm):
+        raise ValueError("Snapshot header is truncated")
+    header = json.loads(mm[header_start:header_start + header_length].decode("utf-8"))
+    if (header["version"] != VERSION or
+            header["byteorder"] != sys.byteorder or
+            header["itemsize"] != memoryview(b"").cast("i").itemsize or
+            header["sources"] != sources):
+        return None
+    dropped = {reason: int(count) for reason, count in header["dropped"].items()}
+
+    data_start = aligned(header_start + header_length)
+    view = memoryview(mm)
+    sections = {}
+    for name in INT_SECTIONS + STR_SECTIONS:
+        offset, length = header["sections"][name]
+        start = data_start + offset
+        if offset < 0 or length < 0 or start + length > len(mm):
+            raise ValueError(f"Snapshot section {name} lies outside the file")
+        if name in INT_SECTIONS:
+            if length % header["itemsize"]:
+                raise ValueError(f"Snapshot section {name} is truncated")
+            sections[name] = view[start:start + length].cast("i")
+        else:
+            count = header["n_people"] if name.startswith("person") else header["n_movies"]
+            sections[name] = split_strings(view[start:start + length], count)
+            if len(sections[name]) != count:
+                raise ValueError(f"Snapshot section {name} has the wrong length")
+    return sections, dropped
+
+
+def split_strings(buffer, count):
+    """Decode a "\\0"-separated string table holding `count` entries."""
+    if count == 0:
+        return []
+    return str(buffer, "utf-8").split("\0")
+
+
+def aligned(n):
+    """Round `n` up to the next multiple of ALIGNMENT."""
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
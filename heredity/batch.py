@@ -0,0 +1,266 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import heredity
+from enumeration import topological_order
+from workers import worker_pool
+
+# Subproblems sent to a worker process at a time
+CHUNK_SIZE = 16
+
+
+def family_files(patterns):
+    """
+    Return the sorted family CSV files named by `patterns`: files,
+    directories (all .csv files directly inside) or glob patterns.
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.update(path for path in glob.glob(os.path.join(pattern, "*.csv"))
+                         if os.path.isfile(path))
+        elif os.path.isfile(pattern):
+            files.add(pattern)
+        else:
+            files.update(path for path in glob.glob(pattern, recursive=True)
+                         if os.path.isfile(path))
+    return sorted(files)
+
+
+def subproblems(people):
+    """
+    Split `people` into groups of relatives, which are independent of each
+    other, and return a list of (names, key) pairs, one per group.
+
+    `names` lists the group parents first, and `key` describes its
+    structure and evidence without names: for every person in that order
+    the positions of their mother and father (-1 if unknown) and their
+    trait. Groups with equal keys have the same distributions, however
+    their people are named.
+    """
+    group = {name: name for name in people}
+
+    def find(name):
+        while group[name] != name:
+            group[name] = group[group[name]]
+            name = group[name]
+        return name
+
+    for name, person in people.items():
+        for parent in (person["mother"], person["father"]):
+            if parent:
+                group[find(parent)] = find(name)
+
+    members = {}
+    for name in people:
+        members.setdefault(find(name), []).append(name)
+
+    problems = []
+    for names in members.values():
+        names = topological_order({name: people[name] for name in names})
+        position = {name: i for i, name in enumerate(names)}
+        key = tuple(
+            (position.get(people[name]["mother"], -1),
+             position.get(people[name]["father"], -1),
+             people[name]["trait"])
+            for name in names
+        )
+        problems.append((names, key))
+    return problems
+
+
+def solve(task):
+    """
+    Run inference on one subproblem. `task` is (key, method). Return
+    (key, distributions, error): the distributions of the people in key
+    order as (gene probabilities for 2, 1 and 0 copies, trait
+    probability), or None and the error message if the method does not
+    support the family or it is too large for the method.
+    """
+    key, method = task
+    people = {}
+    for i, (mother, father, trait) in enumerate(key):
+        people[str(i)] = {
+            "name": str(i),
+            "mother": str(mother) if mother >= 0 else None,
+            "father": str(father) if father >= 0 else None,
+            "trait": trait,
+        }
+    try:
+        probabilities = heredity.METHODS[method](people)
+    except (NotImplementedError, ValueError) as error:
+        return key, None, str(error)
+    distributions = [
+        (tuple(probabilities[str(i)]["gene"][genes] for genes in (2, 1, 0)),
+         probabilities[str(i)]["trait"][True])
+        for i in range(len(key))
+    ]
+    return key, distributions, None
+
+
+def batch_probabilities(files, method="elimination", processes=None):
+    """
+    Run inference with `method` on every family file in `files`, on a
+    pool of `processes` forked worker processes. Identical subproblems,
+    within a family and across families, are solved only once.
+
+    Return (results, stats): results maps every file to its probabilities
+    dict, in the layout `heredity.normalize` produces and with the people
+    in the order of the file, or to an error message; stats counts files,
+    people and (unique) subproblems and holds the run time in seconds.
+
+    A file that cannot be read, names a parent who is not listed in it or
+    makes someone their own ancestor gets an error message and does not
+    stop the other files.
+    """
+    start = time.perf_counter()
+    families = {}
+    unreadable = {}
+    unique = {}
+    n_people = n_problems = 0
+    for path in files:
+        try:
+            people = heredity.load_data(path)
+        except KeyError as error:
+            unreadable[path] = f"Missing column {error}"
+            continue
+        except (OSError, ValueError, csv.Error) as error:
+            unreadable[path] = f"Cannot read family file: {error}"
+            continue
+        try:
+            # keep the row order of the file for the results
+            families[path] = (list(people), subproblems(people))
+        except KeyError as error:
+            unreadable[path] = f"Parent {error} is not listed in the file"
+            continue
+        except ValueError as error:
+            # someone is their own ancestor
+            unreadable[path] = str(error)
+            continue
+        n_people += len(people)
+        n_problems += len(families[path][1])
+        for _, key in families[path][1]:
+            unique.setdefault(key, None)
+
+    solved = {}
+    with worker_pool(processes) as pool:
+        tasks = [(key, method) for key in unique]
+        for key, distributions, error in pool.imap_unordered(solve, tasks, CHUNK_SIZE):
+            solved[key] = (distributions, error)
+
+    results = {}
+    for path in files:
+        if path in unreadable:
+            results[path] = unreadable[path]
+            continue
+        order, problems = families[path]
+        probabilities = {}
+        for names, key in problems:
+            distributions, error = solved[key]
+            if error is not None:
+                probabilities = error
+                break
+            for name, (genes, has_trait) in zip(names, distributions):
+                probabilities[name] = {
+                    "gene": dict(zip((2, 1, 0), genes)),
+                    "trait": {True: has_trait, False: 1 - has_trait},
+                }
+        else:
+            probabilities = {name: probabilities[name] for name in order}
+        results[path] = probabilities
+
+    stats = {
+        "files": len(files),
+        "unreadable_files": len(unreadable),
+        "people": n_people,
+        "subproblems": n_problems,
+        "unique_subproblems": len(unique),
+        "seconds": time.perf_counter() - start,
+    }
+    return results, stats
+
+
+def write_json(f, results, method, stats):
+    """Write `results` with their `method` and `stats` to `f` as JSON."""
+    families = {}
+    for path, probabilities in results.items():
+        if isinstance(probabilities, str):
+            families[path] = {"error": probabilities}
+            continue
+        families[path] = {
+            name: {
+                "gene": {str(genes): p for genes, p in distribution["gene"].items()},
+                "trait": {str(trait).lower(): p for trait, p in distribution["trait"].items()},
+            }
+            for name, distribution in probabilities.items()
+        }
+    json.dump({"method": method, "stats": stats, "families": families}, f, indent=2)
+    print(file=f)
+
+
+def write_csv(f, results):
+    """
+    Write `results` to `f` as CSV, one row per person. Families the method
+    could not handle get a single row with the error instead of a name.
+    """
+    writer = csv.writer(f)
+    writer.writerow(["file", "name", "gene_2", "gene_1", "gene_0", "trait", "error"])
+    for path, probabilities in results.items():
+        if isinstance(probabilities, str):
+            writer.writerow([path, "", "", "", "", "", probabilities])
+            continue
+        for name, distribution in probabilities.items():
+            gene = distribution["gene"]
+            writer.writerow([path, name, gene[2], gene[1], gene[0],
+                             distribution["trait"][True], ""])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait probabilities for many families at once.")
+    parser.add_argument("families", nargs="+",
+                        help="family CSV files, directories of them or glob patterns")
+    parser.add_argument("--method", choices=list(heredity.METHODS), default="elimination",
+                        help="exact inference method (default elimination)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--output", default=None,
+                        help="write the results to this file instead of stdout")
+    parser.add_argument("--format", choices=["json", "csv"], default=None,
+                        help="output format (default: from the output file extension, "
+                             "else json)")
+    args = parser.parse_args()
+
+    files = family_files(args.families)
+    if not files:
+        sys.exit("No family files found")
+    output_format = args.format
+    if output_format is None:
+        is_csv = args.output is not None and args.output.lower().endswith(".csv")
+        output_format = "csv" if is_csv else "json"
+
+    results, stats = batch_probabilities(files, args.method, args.processes)
+    print(f"{stats['files']} files, {stats['people']} people, {stats['subproblems']} "
+          f"subproblems ({stats['unique_subproblems']} unique) in {stats['seconds']:.2f}s",
+          file=sys.stderr)
+    if stats["unreadable_files"]:
+        print(f"{stats['unreadable_files']} files could not be read", file=sys.stderr)
+
+    f = sys.stdout if args.output is None else open(args.output, "w", newline="")
+    try:
+        if output_format == "csv":
+            write_csv(f, results)
+        else:
+            write_json(f, results, args.method, stats)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+if __name__ == "__main__":
+    main()
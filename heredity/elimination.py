@@ -0,0 +1,250 @@
+import itertools
+
+# Every gene variable counts the copies of the gene a person has: 0, 1 or 2
+GENE_COUNTS = 3
+
+# Most entries a factor may have; a cluster of 12 people takes 3^12 of them
+MAX_FACTOR_SIZE = GENE_COUNTS ** 12
+
+
+class Factor():
+    """
+    Non-negative function of the gene counts of some people.
+
+    `variables` is a tuple of names, `values` a flat list with one entry
+    per assignment of gene counts to them, in row-major order: the entry
+    of counts (a1, ..., ak) is at a1 * 3^(k - 1) + ... + ak.
+    """
+
+    def __init__(self, variables, values):
+        self.variables = tuple(variables)
+        self.values = values
+
+    def strides(self, scope):
+        """
+        Return for every variable of `scope` how far the index into
+        `values` moves per gene count of that variable (0 if the factor
+        does not depend on it).
+        """
+        stride = {}
+        step = 1
+        for variable in reversed(self.variables):
+            stride[variable] = step
+            step *= GENE_COUNTS
+        return [stride.get(variable, 0) for variable in scope]
+
+
+def multiply(factors, scope=None):
+    """
+    Return the product of `factors` as a Factor over `scope`, by default
+    the union of their variables in order of first appearance.
+    """
+    if scope is None:
+        scope = []
+        for factor in factors:
+            scope.extend(v for v in factor.variables if v not in scope)
+    values = [1.0] * GENE_COUNTS ** len(scope)
+    for factor in factors:
+        table = factor.values
+        values = [p * table[i] for p, i in zip(values, positions(factor.strides(scope)))]
+    return Factor(scope, values)
+
+
+def marginalize(factor, keep):
+    """
+    Return `factor` summed over all variables not in `keep`, scaled to sum
+    1 so that long products of messages do not underflow.
+    """
+    scope = [v for v in factor.variables if v in keep]
+    values = [0.0] * GENE_COUNTS ** len(scope)
+    for i, p in zip(positions(Factor(scope, None).strides(factor.variables)), factor.values):
+        values[i] += p
+    total = sum(values)
+    if total > 0:
+        values = [p / total for p in values]
+    return Factor(scope, values)
+
+
+def positions(strides):
+    """
+    Return, for every assignment of a scope in row-major order, the index
+    sum(count * stride) given the `strides` of its variables.
+    """
+    indexes = [0]
+    for stride in strides:
+        steps = [count * stride for count in range(GENE_COUNTS)]
+        indexes = [i + step for i in indexes for step in steps]
+    return indexes
+
+
+def passing_probability(genes, probs):
+    """Return the probability that a parent with `genes` copies passes one on."""
+    mutation = probs["mutation"]
+    return (mutation, 0.5, 1 - mutation)[genes]
+
+
+def family_factors(people, probs):
+    """
+    Return the factors of the Bayesian network of `people`: the gene
+    distribution of every person (unconditional, or given the genes of
+    both parents) times the probability of their observed trait, if any.
+    Unobserved traits sum to 1 and need no factor.
+    """
+    factors = []
+    for name, person in people.items():
+        mother, father = person["mother"], person["father"]
+        trait = person["trait"]
+        evidence = [1.0 if trait is None else probs["trait"][genes][trait]
+                    for genes in range(GENE_COUNTS)]
+
+        if not mother and not father:
+            factors.append(Factor((name,), [probs["gene"][genes] * evidence[genes]
+                                            for genes in range(GENE_COUNTS)]))
+            continue
+        if not mother or not father:
+            raise NotImplementedError("Case with only one Parent is not supported")
+
+        values = []
+        for mother_genes, father_genes, genes in itertools.product(range(GENE_COUNTS),
+                                                                   repeat=3):
+            pm = passing_probability(mother_genes, probs)
+            pf = passing_probability(father_genes, probs)
+            inherit = (
+                (1 - pm) * (1 - pf),
+                pm * (1 - pf) + pf * (1 - pm),
+                pm * pf,
+            )[genes]
+            values.append(inherit * evidence[genes])
+        factors.append(Factor((mother, father, name), values))
+    return factors
+
+
+def interaction_graph(factors):
+    """
+    Return a dict mapping every variable of `factors` to the set of
+    variables it shares a factor with.
+    """
+    neighbours = {}
+    for factor in factors:
+        for v in factor.variables:
+            neighbours.setdefault(v, set()).update(u for u in factor.variables if u != v)
+    return neighbours
+
+
+def largest_cluster(factors, order):
+    """
+    Return the number of variables of the largest factor that eliminating
+    the variables of `factors` in `order` builds.
+    """
+    neighbours = interaction_graph(factors)
+    largest = 0
+    for v in order:
+        adjacent = neighbours.pop(v)
+        for a in adjacent:
+            neighbours[a].discard(v)
+            neighbours[a].update(adjacent - {a})
+        largest = max(largest, len(adjacent) + 1)
+    return largest
+
+
+def elimination_order(factors):
+    """
+    Return an order to eliminate the variables of `factors` in, chosen
+    greedily: next is always the variable whose elimination adds the
+    fewest new edges between its neighbours (min-fill), ties broken by
+    fewest neighbours. Pedigrees are tree-like, so this keeps the
+    intermediate factors small.
+    """
+    neighbours = interaction_graph(factors)
+
+    def cost(v):
+        adjacent = list(neighbours[v])
+        fill = sum(1 for a, b in itertools.combinations(adjacent, 2)
+                   if b not in neighbours[a])
+        return fill, len(adjacent)
+
+    order = []
+    while neighbours:
+        v = min(neighbours, key=cost)
+        adjacent = neighbours.pop(v)
+        for a in adjacent:
+            neighbours[a].discard(v)
+            neighbours[a].update(adjacent - {a})
+        order.append(v)
+    return order
+
+
+def elimination_probabilities(people, probs):
+    """
+    Return the gene and trait distribution of every person given the
+    observed traits, in the layout `heredity.normalize` produces.
+
+    Variable elimination along `elimination_order` forms one cluster per
+    eliminated person: the factors first mentioning them together with
+    the messages of earlier clusters involving them. Its message, summed
+    over that person, flows to the cluster that eliminates a variable of
+    the message next, which makes the clusters a tree. A second pass sends
+    messages back down the tree, after which every cluster holds the
+    marginal of its person. The cost grows with the number of people
+    times 3 to the power of the largest cluster, not exponentially in the
+    number of people.
+
+    Raise ValueError if the largest cluster would need more than
+    MAX_FACTOR_SIZE entries.
+    """
+    factors = family_factors(people, probs)
+    order = elimination_order(factors)
+    width = largest_cluster(factors, order)
+    if GENE_COUNTS ** width > MAX_FACTOR_SIZE:
+        raise ValueError(f"Variable elimination needs a factor over {width} people "
+                         f"({GENE_COUNTS ** width} entries) for this family. "
+                         f"Use --method gibbs or likelihood instead.")
+    unused = list(factors)
+
+    # upward pass: plain variable elimination
+    clusters = []
+    pending = []
+    for variable in order:
+        own = [f for f in unused if variable in f.variables]
+        unused = [f for f in unused if variable not in f.variables]
+        children = [(c, m) for c, m in pending if variable in m.variables]
+        pending = [(c, m) for c, m in pending if variable not in m.variables]
+
+        product = multiply(own + [m for _, m in children])
+        message = marginalize(product, set(product.variables) - {variable})
+        cluster = {
+            "variable": variable,
+            "scope": product.variables,
+            "factors": own,
+            "children": children,
+            "down": None,
+        }
+        clusters.append(cluster)
+        pending.append((cluster, message))
+
+    # downward pass: clusters were created children first, so go backwards
+    probabilities = {}
+    for cluster in reversed(clusters):
+        incoming = [m for _, m in cluster["children"]]
+        if cluster["down"] is not None:
+            incoming.append(cluster["down"])
+        for child, up in cluster["children"]:
+            others = [m for m in incoming if m is not up]
+            product = multiply(cluster["factors"] + others, cluster["scope"])
+            child["down"] = marginalize(product, set(up.variables))
+
+        belief = marginalize(multiply(cluster["factors"] + incoming, cluster["scope"]),
+                             {cluster["variable"]})
+        name = cluster["variable"]
+        genes = belief.values
+        trait = people[name]["trait"]
+        if trait is None:
+            has_trait = sum(genes[g] * probs["trait"][g][True] for g in range(GENE_COUNTS))
+        else:
+            has_trait = 1.0 if trait else 0.0
+        probabilities[name] = {
+            "gene": {2: genes[2], 1: genes[1], 0: genes[0]},
+            "trait": {True: has_trait, False: 1 - has_trait},
+        }
+
+    return {name: probabilities[name] for name in people}
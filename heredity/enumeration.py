@@ -0,0 +1,153 @@
+from elimination import GENE_COUNTS, family_factors
+
+
+def topological_order(people):
+    """
+    Return the names of `people` ordered so that parents always come
+    before their children. Raise ValueError if someone is their own
+    ancestor, as no such order exists.
+    """
+    def parents(name):
+        return [p for p in (people[name]["mother"], people[name]["father"]) if p]
+
+    order = []
+    placed = set()
+    for name in people:
+        if name in placed:
+            continue
+        # walk up the ancestors depth first with an explicit stack; `path`
+        # holds the people on it, whose parents are still being placed
+        path = {name}
+        stack = [(name, iter(parents(name)))]
+        while stack:
+            current, pending = stack[-1]
+            parent = next(pending, None)
+            if parent is None:
+                stack.pop()
+                path.discard(current)
+                placed.add(current)
+                order.append(current)
+            elif parent in path:
+                raise ValueError(f"{parent} is their own ancestor")
+            elif parent not in placed:
+                path.add(parent)
+                stack.append((parent, iter(parents(parent))))
+    return order
+
+
+def lookup_tables(people, order, probs):
+    """
+    Return (parents, factors, trait_true) for the people in `order`.
+
+    parents[i] holds the positions of both parents of person i, or None.
+    factors[i] is the table of `elimination.family_factors` for person i:
+    the probability of each gene count times the probability of their
+    observed trait, indexed by gene count for people without parents and
+    by (mother_genes * 3 + father_genes) * 3 + genes otherwise.
+    trait_true[i][genes] is the probability that person i has the trait.
+    """
+    position = {name: i for i, name in enumerate(order)}
+    tables = {factor.variables[-1]: factor for factor in family_factors(people, probs)}
+
+    parents, factors, trait_true = [], [], []
+    for name in order:
+        factor = tables[name]
+        if len(factor.variables) == 1:
+            parents.append(None)
+        else:
+            mother, father, _ = factor.variables
+            parents.append((position[mother], position[father]))
+        factors.append(factor.values)
+
+        trait = people[name]["trait"]
+        if trait is None:
+            trait_true.append([probs["trait"][genes][True] for genes in range(GENE_COUNTS)])
+        else:
+            trait_true.append([1.0 if trait else 0.0] * GENE_COUNTS)
+    return parents, factors, trait_true
+
+
+def assignments(parents, factors):
+    """
+    Lazily yield (one_gene, two_genes, p) for every assignment of gene
+    counts, where bit i of the masks one_gene and two_genes is set if
+    person i has one or two copies of the gene, and p is the joint
+    probability of the genes and the observed traits.
+
+    People are assigned in order with a depth-first odometer that keeps
+    the product of the factors assigned so far, so every step costs one
+    table lookup and one multiplication. Partial assignments of
+    probability 0 are not extended.
+    """
+    n = len(factors)
+    if n == 0:
+        yield 0, 0, 1.0
+        return
+    genes = [-1] * n
+    partial = [1.0] * (n + 1)
+    one_gene = two_genes = 0
+    i = 0
+    while i >= 0:
+        bit = 1 << i
+        one_gene &= ~bit
+        two_genes &= ~bit
+        g = genes[i] + 1
+        if g == GENE_COUNTS:
+            genes[i] = -1
+            i -= 1
+            continue
+        genes[i] = g
+
+        if parents[i] is None:
+            p = partial[i] * factors[i][g]
+        else:
+            mother, father = parents[i]
+            p = partial[i] * factors[i][(genes[mother] * GENE_COUNTS + genes[father])
+                                        * GENE_COUNTS + g]
+        if p == 0:
+            continue
+        if g == 1:
+            one_gene |= bit
+        elif g == 2:
+            two_genes |= bit
+
+        if i == n - 1:
+            yield one_gene, two_genes, p
+        else:
+            partial[i + 1] = p
+            i += 1
+
+
+def enumeration_probabilities(people, probs):
+    """
+    Return the gene and trait distribution of every person given the
+    observed traits, in the layout `heredity.normalize` produces, by exact
+    enumeration of all gene assignments.
+
+    Traits are not enumerated: observed traits are part of the factors,
+    and for the others the probability of having the trait given the
+    genes is added up directly. Memory use does not depend on the number
+    of assignments.
+    """
+    order = topological_order(people)
+    parents, factors, trait_true = lookup_tables(people, order, probs)
+    n = len(order)
+    gene_mass = [[0.0] * GENE_COUNTS for _ in range(n)]
+    trait_mass = [0.0] * n
+
+    for one_gene, two_genes, p in assignments(parents, factors):
+        for i in range(n):
+            bit = 1 << i
+            g = 1 if one_gene & bit else 2 if two_genes & bit else 0
+            gene_mass[i][g] += p
+            trait_mass[i] += p * trait_true[i][g]
+
+    probabilities = {}
+    for i, name in enumerate(order):
+        total = sum(gene_mass[i])
+        has_trait = trait_mass[i] / total
+        probabilities[name] = {
+            "gene": {genes: gene_mass[i][genes] / total for genes in (2, 1, 0)},
+            "trait": {True: has_trait, False: 1 - has_trait},
+        }
+    return {name: probabilities[name] for name in people}
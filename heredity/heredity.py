@@ -1,7 +1,13 @@
+import argparse
 import csv
 import itertools
 import sys
 
+import elimination
+import enumeration
+import sampling
+import vectorized
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -38,11 +44,67 @@ PROBS = {
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait probabilities for a family.")
+    parser.add_argument("data", help="CSV file with columns name, mother, father, trait")
+    parser.add_argument("--method", choices=[*METHODS, *SAMPLERS], default="powerset",
+                        help="brute force over all assignments (default), streamed "
+                             "enumeration of gene assignments, batched NumPy evaluation "
+                             "of all assignments, variable elimination, which scales "
+                             "to large families, or approximate likelihood weighting or "
+                             "Gibbs sampling")
+    parser.add_argument("--samples", type=int, default=sampling.SAMPLES,
+                        help=f"sample budget of the samplers (default {sampling.SAMPLES})")
+    parser.add_argument("--chains", type=int, default=sampling.CHAINS,
+                        help=f"independent chains of the samplers (default {sampling.CHAINS})")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes running the chains")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the samplers")
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    # every method assumes a pedigree in which nobody is their own ancestor
+    try:
+        enumeration.topological_order(people)
+    except KeyError as error:
+        sys.exit(f"Parent {error} is not listed in the file")
+    except ValueError as error:
+        sys.exit(str(error))
+
+    try:
+        if args.method in SAMPLERS:
+            probabilities, diagnostics = SAMPLERS[args.method](
+                people, args.samples, args.chains, args.processes, args.seed)
+        else:
+            probabilities = METHODS[args.method](people)
+    except ValueError as error:
+        sys.exit(str(error))
+
+    if args.method in SAMPLERS:
+        print(", ".join(f"{key}: {value:.4g}" if isinstance(value, float)
+                        else f"{key}: {value}" for key, value in diagnostics.items()))
+        effective = diagnostics.get("effective_samples")
+        if effective is not None and effective < sampling.MIN_EFFECTIVE_SAMPLES:
+            print(f"Warning: only {effective:.1f} effective samples; the weights are "
+                  f"dominated by a few assignments and the estimates are unreliable. "
+                  f"Use --method gibbs or elimination for this family.", file=sys.stderr)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+
+def powerset_probabilities(people):
+    """
+    Return the gene and trait distribution of every person by summing the
+    joint probability of every assignment consistent with the evidence.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -83,15 +145,52 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+def elimination_probabilities(people):
+    """
+    Return the same distributions as `powerset_probabilities`, computed by
+    variable elimination on the Bayesian network of the family.
+    """
+    return elimination.elimination_probabilities(people, PROBS)
+
+
+def enumeration_probabilities(people):
+    """
+    Return the same distributions as `powerset_probabilities`, summing
+    over gene assignments streamed one at a time as integer bit masks.
+    """
+    return enumeration.enumeration_probabilities(people, PROBS)
+
+
+def vectorized_probabilities(people):
+    """
+    Return the same distributions as `powerset_probabilities`, evaluating
+    the joint probabilities of all assignments in NumPy batches.
+    """
+    return vectorized.vectorized_probabilities(people, PROBS)
+
+
+def likelihood_weighting_probabilities(people, samples=sampling.SAMPLES, chains=sampling.CHAINS,
+                                       processes=None, seed=None):
+    """
+    Return (probabilities, diagnostics): estimates of the distributions of
+    `powerset_probabilities` by likelihood weighting, from `samples`
+    assignments drawn in `chains` chains spread over `processes` worker
+    processes, and a dict describing their accuracy.
+    """
+    return sampling.likelihood_weighting(people, PROBS, samples, chains, processes, seed)
+
+
+def gibbs_probabilities(people, samples=sampling.SAMPLES, chains=sampling.CHAINS,
+                        processes=None, seed=None):
+    """
+    Return (probabilities, diagnostics) like
+    `likelihood_weighting_probabilities`, estimated by Gibbs sampling,
+    with the R-hat convergence diagnostic of the chains.
+    """
+    return sampling.gibbs_sampling(people, PROBS, samples, chains, processes, seed)
 
 
 def load_data(filename):
@@ -265,5 +364,18 @@ def normalize(probabilities):
                 probability_dict[k] *= normalization_factor
 
 
+METHODS = {
+    "powerset": powerset_probabilities,
+    "enumeration": enumeration_probabilities,
+    "vectorized": vectorized_probabilities,
+    "elimination": elimination_probabilities,
+}
+
+SAMPLERS = {
+    "likelihood": likelihood_weighting_probabilities,
+    "gibbs": gibbs_probabilities,
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,313 @@
+import numpy as np
+
+from elimination import GENE_COUNTS
+from enumeration import topological_order
+from vectorized import FamilyArrays, log_tables
+from workers import worker_pool
+
+# Default number of sampled assignments, summed over all chains
+SAMPLES = 100_000
+
+# Default number of independent chains
+CHAINS = 4
+
+# Gibbs walkers updated together in every chain
+WALKERS = 256
+
+# Likelihood weighting samples drawn together in one batch
+BATCH_SIZE = 16_384
+
+# Fewer effective likelihood weighting samples than this, and the
+# estimates rest on a handful of assignments
+MIN_EFFECTIVE_SAMPLES = 100
+
+# Model read by the worker processes of run_chains, set before the pool
+# is created so that it is not pickled for every chain
+shared_model = None
+
+
+class Model():
+    """
+    The Bayesian network of a family, as the probability tables used by
+    `joint_probability`, arranged for sampling.
+    """
+
+    def __init__(self, people, probs):
+        self.family = family = FamilyArrays(people)
+        position = {name: i for i, name in enumerate(family.names)}
+        self.order = [position[name] for name in topological_order(people)]
+        self.children = [[] for _ in range(family.n)]
+        for child in range(family.n):
+            if family.mothers[child] >= 0:
+                self.children[family.mothers[child]].append(child)
+                self.children[family.fathers[child]].append(child)
+
+        self.log_gene, self.log_inherit, self.log_trait = log_tables(probs)
+        self.gene_cdf = np.cumsum(np.exp(self.log_gene))
+        self.inherit_cdf = np.cumsum(np.exp(self.log_inherit), axis=2)
+        # log probability of the observed trait per person and gene count,
+        # 0 for people whose trait is unknown
+        self.log_evidence = np.where(family.observed[:, None],
+                                     self.log_trait[:, family.traits.astype(np.int64)].T, 0.0)
+        # probability of having the trait per person and gene count
+        self.trait_true = np.where(family.observed[:, None], family.traits[:, None],
+                                   np.exp(self.log_trait[:, 1]))
+
+    @property
+    def n(self):
+        return self.family.n
+
+
+def forward_sample(model, rng, size):
+    """
+    Return `size` gene assignments drawn from the unconditional gene
+    distribution, parents before children, as an array of shape
+    (size, people).
+    """
+    genes = np.empty((size, model.n), dtype=np.int64)
+    mothers, fathers = model.family.mothers, model.family.fathers
+    for i in model.order:
+        if mothers[i] < 0:
+            cdf = model.gene_cdf
+        else:
+            cdf = model.inherit_cdf[genes[:, mothers[i]], genes[:, fathers[i]]]
+        u = rng.random(size)[:, None]
+        genes[:, i] = (u > cdf[..., :GENE_COUNTS - 1]).sum(axis=1)
+    return genes
+
+
+def gene_counts(genes, weights=None):
+    """
+    Return an array of shape (people, 3) with the (weighted) number of
+    rows of `genes` giving every person each gene count.
+    """
+    n = genes.shape[1]
+    if weights is not None:
+        weights = np.repeat(weights, n)
+    counts = np.bincount((np.arange(n) * GENE_COUNTS + genes).ravel(), weights,
+                         minlength=n * GENE_COUNTS)
+    return counts.reshape(n, GENE_COUNTS)
+
+
+def likelihood_weighting_chain(task):
+    """
+    Draw `samples` gene assignments of `shared_model` from the gene
+    distribution and weight each by the probability of the observed
+    traits. `task` is (samples, seed sequence).
+
+    Unknown traits are not sampled: the probability of having the trait
+    given the sampled genes is added instead, which gives the same
+    expectation with less noise.
+
+    Return (gene_mass, trait_mass, weight, squared_weight, shift), all
+    weights taken relative to exp(shift) so they do not underflow.
+    """
+    samples, seed = task
+    model = shared_model
+    rng = np.random.default_rng(seed)
+    person = np.arange(model.n)
+    gene_mass = np.zeros((model.n, GENE_COUNTS))
+    trait_mass = np.zeros(model.n)
+    weight = squared_weight = 0.0
+    shift = -np.inf
+    for start in range(0, samples, BATCH_SIZE):
+        genes = forward_sample(model, rng, min(BATCH_SIZE, samples - start))
+        log_weights = model.log_evidence[person, genes].sum(axis=1)
+        batch_max = log_weights.max()
+        if batch_max > shift:
+            scale = np.exp(shift - batch_max)
+            gene_mass *= scale
+            trait_mass *= scale
+            weight *= scale
+            squared_weight *= scale ** 2
+            shift = batch_max
+        weights = np.exp(log_weights - shift)
+        gene_mass += gene_counts(genes, weights)
+        trait_mass += weights @ model.trait_true[person, genes]
+        weight += weights.sum()
+        squared_weight += (weights ** 2).sum()
+    return gene_mass, trait_mass, weight, squared_weight, shift
+
+
+def gibbs_chain(task):
+    """
+    Run one Gibbs sampling chain on `shared_model`. `task` is (samples,
+    walkers, seed sequence).
+
+    The chain updates `walkers` independent assignments together, starting
+    from the gene distribution. A sweep draws the genes of every person in
+    turn from their distribution given the genes of their parents, their
+    children and the children's other parents, and their observed trait.
+    The first half of the samples // walkers sweeps is discarded as burn-in.
+
+    After every remaining sweep, the chain records the fraction of walkers
+    giving each person each gene count and their mean probability of
+    having the trait. Return (sums, squares, sweeps): the sums and sums of
+    squares of these records over the kept sweeps, for the means and
+    `potential_scale_reduction`.
+    """
+    samples, walkers, seed = task
+    model = shared_model
+    rng = np.random.default_rng(seed)
+    mothers, fathers = model.family.mothers, model.family.fathers
+    person = np.arange(model.n)
+    inherit = np.exp(model.log_inherit)
+    evidence = np.exp(model.log_evidence)
+    founder = np.exp(model.log_gene)
+    # rows of the child's gene distribution, by (mother genes, father genes),
+    # and as a function of one parent's genes, by (other parent genes,
+    # child genes), for a mother and a father respectively
+    by_parents = inherit.reshape(GENE_COUNTS ** 2, GENE_COUNTS)
+    by_other = {
+        True: inherit.transpose(1, 2, 0).reshape(GENE_COUNTS ** 2, GENE_COUNTS),
+        False: inherit.transpose(0, 2, 1).reshape(GENE_COUNTS ** 2, GENE_COUNTS),
+    }
+    links = [[(child, fathers[child] if mothers[child] == i else mothers[child],
+               by_other[bool(mothers[child] == i)]) for child in model.children[i]]
+             for i in range(model.n)]
+
+    sweeps = max(2, samples // walkers)
+    burn_in = sweeps // 2
+    genes = forward_sample(model, rng, walkers)
+    sums = squares = 0.0
+    for sweep in range(sweeps):
+        for i in range(model.n):
+            if mothers[i] < 0:
+                p = np.broadcast_to(founder * evidence[i], (walkers, GENE_COUNTS))
+            else:
+                p = by_parents[genes[:, mothers[i]] * GENE_COUNTS + genes[:, fathers[i]]] \
+                    * evidence[i]
+            for child, other, table in links[i]:
+                p = p * table[genes[:, other] * GENE_COUNTS + genes[:, child]]
+            cdf = p.cumsum(axis=1)
+            u = rng.random(walkers) * cdf[:, -1]
+            genes[:, i] = (u > cdf[:, 0]).astype(np.int64) + (u > cdf[:, 1])
+
+        if sweep >= burn_in:
+            record = np.concatenate([gene_counts(genes).ravel() / walkers,
+                                     model.trait_true[person, genes].mean(axis=0)])
+            sums = sums + record
+            squares = squares + record ** 2
+    return sums, squares, sweeps - burn_in
+
+
+def run_chains(model, chain, tasks, processes):
+    """
+    Return the results of `chain` for every task, run on a pool of
+    `processes` forked worker processes sharing `model`.
+    """
+    global shared_model
+    shared_model = model
+    with worker_pool(processes) as pool:
+        return list(pool.imap_unordered(chain, tasks))
+
+
+def likelihood_weighting(people, probs, samples=SAMPLES, chains=CHAINS, processes=None,
+                         seed=None):
+    """
+    Estimate the gene and trait distribution of every person given the
+    observed traits by likelihood weighting, from `samples` assignments
+    split over `chains` independently seeded chains.
+
+    Return (probabilities, diagnostics): the distributions in the layout
+    `heredity.normalize` produces, and a dict with the number of samples,
+    their effective number given the spread of the weights, and the
+    largest standard error of a probability, estimated from the
+    differences between the chains.
+    """
+    model = Model(people, probs)
+    chains = max(2, chains)
+    per_chain = max(1, samples // chains)
+    tasks = [(per_chain, s) for s in np.random.SeedSequence(seed).spawn(chains)]
+    results = run_chains(model, likelihood_weighting_chain, tasks, processes)
+
+    shift = max(result[4] for result in results)
+    gene_mass, trait_mass, weight, squared_weight = 0.0, 0.0, 0.0, 0.0
+    estimates = []
+    for chain_genes, chain_trait, chain_weight, chain_squared, chain_shift in results:
+        scale = np.exp(chain_shift - shift)
+        gene_mass = gene_mass + chain_genes * scale
+        trait_mass = trait_mass + chain_trait * scale
+        weight += chain_weight * scale
+        squared_weight += chain_squared * scale ** 2
+        estimates.append(np.concatenate([chain_genes.ravel(), chain_trait]) / chain_weight)
+
+    diagnostics = {
+        "samples": per_chain * chains,
+        "chains": chains,
+        "effective_samples": float(weight ** 2 / squared_weight),
+        "max_std_error": float(np.std(estimates, axis=0, ddof=1).max() / np.sqrt(chains)),
+    }
+    return distributions(model, gene_mass / weight, trait_mass / weight), diagnostics
+
+
+def gibbs_sampling(people, probs, samples=SAMPLES, chains=CHAINS, processes=None, seed=None,
+                   walkers=WALKERS):
+    """
+    Estimate the gene and trait distribution of every person given the
+    observed traits by Gibbs sampling, spending `samples` assignments on
+    `chains` independently seeded chains of `walkers` walkers each.
+
+    Return (probabilities, diagnostics): the distributions in the layout
+    `heredity.normalize` produces, and a dict with the number of samples,
+    the sweeps per chain and how many of them were burn-in, and the
+    largest potential scale reduction (R-hat) of any probability. R-hat
+    near 1 means the chains agree; above about 1.01 more samples are
+    needed.
+    """
+    model = Model(people, probs)
+    chains = max(2, chains)
+    walkers = max(1, min(walkers, samples // (2 * chains)))
+    per_chain = max(2 * walkers, samples // chains)
+    tasks = [(per_chain, walkers, s) for s in np.random.SeedSequence(seed).spawn(chains)]
+    results = run_chains(model, gibbs_chain, tasks, processes)
+
+    sums = np.array([result[0] for result in results])
+    squares = np.array([result[1] for result in results])
+    kept = results[0][2]
+    means = sums.mean(axis=0) / kept
+    sweeps = max(2, per_chain // walkers)
+
+    diagnostics = {
+        "samples": sweeps * walkers * chains,
+        "chains": chains,
+        "walkers": walkers,
+        "sweeps": sweeps,
+        "burn_in": sweeps - kept,
+        "max_rhat": potential_scale_reduction(sums, squares, kept),
+    }
+    n_genes = model.n * GENE_COUNTS
+    return distributions(model, means[:n_genes].reshape(model.n, GENE_COUNTS),
+                         means[n_genes:]), diagnostics
+
+
+def potential_scale_reduction(sums, squares, draws):
+    """
+    Return the largest Gelman-Rubin potential scale reduction over all
+    recorded quantities, given per chain (rows) the sums and sums of
+    squares of `draws` draws of every quantity (columns). Quantities that
+    did not vary within any chain are left out.
+    """
+    if draws < 2 or len(sums) < 2:
+        return float("nan")
+    means = sums / draws
+    within = np.maximum((squares - draws * means ** 2) / (draws - 1), 0).mean(axis=0)
+    between = means.var(axis=0, ddof=1)
+    varying = within > 1e-12
+    pooled = (draws - 1) / draws * within[varying] + between[varying]
+    return float(np.sqrt(pooled / within[varying]).max(initial=1.0))
+
+
+def distributions(model, genes, traits):
+    """
+    Return the probabilities dict for gene distributions `genes` of shape
+    (people, 3) and trait probabilities `traits`, scaled to sum 1.
+    """
+    genes = genes / genes.sum(axis=1, keepdims=True)
+    return {
+        name: {
+            "gene": {count: float(genes[i, count]) for count in (2, 1, 0)},
+            "trait": {True: float(traits[i]), False: float(1 - traits[i])},
+        }
+        for i, name in enumerate(model.family.names)
+    }
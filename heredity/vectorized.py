@@ -0,0 +1,157 @@
+import numpy as np
+
+from elimination import GENE_COUNTS, passing_probability
+
+# Number of assignments evaluated together in one batch
+BATCH_SIZE = 65_536
+
+
+class FamilyArrays():
+    """
+    The people of a family as arrays: person i is `names[i]`, and
+    mothers[i] and fathers[i] are the positions of their parents, or -1.
+    `observed` marks the people whose trait is known, `traits` holds it.
+    """
+
+    def __init__(self, people):
+        self.names = list(people)
+        position = {name: i for i, name in enumerate(self.names)}
+        mothers, fathers = [], []
+        for name in self.names:
+            mother, father = people[name]["mother"], people[name]["father"]
+            if bool(mother) != bool(father):
+                raise NotImplementedError("Case with only one Parent is not supported")
+            mothers.append(position[mother] if mother else -1)
+            fathers.append(position[father] if father else -1)
+        self.mothers = np.array(mothers, dtype=np.int64)
+        self.fathers = np.array(fathers, dtype=np.int64)
+        self.observed = np.array([people[name]["trait"] is not None for name in self.names])
+        self.traits = np.array([bool(people[name]["trait"]) for name in self.names])
+
+    @property
+    def n(self):
+        return len(self.names)
+
+
+def log_tables(probs):
+    """
+    Return (log_gene, log_inherit, log_trait): the logarithms of the
+    unconditional gene distribution indexed by gene count, of the child's
+    gene distribution indexed by (mother, father, child) gene counts, and
+    of the trait distribution indexed by (gene count, trait).
+    """
+    log_gene = np.log([probs["gene"][genes] for genes in range(GENE_COUNTS)])
+    inherit = np.zeros((GENE_COUNTS, GENE_COUNTS, GENE_COUNTS))
+    for mother_genes in range(GENE_COUNTS):
+        for father_genes in range(GENE_COUNTS):
+            pm = passing_probability(mother_genes, probs)
+            pf = passing_probability(father_genes, probs)
+            inherit[mother_genes, father_genes] = (
+                (1 - pm) * (1 - pf),
+                pm * (1 - pf) + pf * (1 - pm),
+                pm * pf,
+            )
+    log_trait = np.log([[probs["trait"][genes][False], probs["trait"][genes][True]]
+                        for genes in range(GENE_COUNTS)])
+    with np.errstate(divide="ignore"):
+        return log_gene, np.log(inherit), log_trait
+
+
+def log_joint_probabilities(family, genes, traits, tables):
+    """
+    Return the natural logarithm of `joint_probability` for a batch of
+    assignments at once.
+
+    `genes` is an integer array of shape (assignments, people) with the
+    gene count of every person, `traits` a boolean array of the same shape,
+    and `tables` the result of `log_tables`. Summing logarithms instead of
+    multiplying probabilities keeps large families from underflowing.
+    """
+    log_gene, log_inherit, log_trait = tables
+    founders = family.mothers < 0
+    children = ~founders
+
+    log_p = log_trait[genes, traits.astype(np.int64)].sum(axis=1)
+    log_p += log_gene[genes[:, founders]].sum(axis=1)
+    log_p += log_inherit[genes[:, family.mothers[children]],
+                         genes[:, family.fathers[children]],
+                         genes[:, children]].sum(axis=1)
+    return log_p
+
+
+def update_batch(gene_mass, trait_mass, genes, traits, p):
+    """
+    Add the probabilities `p` of a batch of assignments to the marginals,
+    like `update` does for a single one: gene_mass[i, g] collects the
+    probability of person i having g genes, trait_mass[i, t] of having
+    trait t. Both arrays are updated in place with scatter-adds.
+    """
+    n = genes.shape[1]
+    person = np.arange(n)
+    weights = np.repeat(p, n)
+    gene_mass += np.bincount((person * GENE_COUNTS + genes).ravel(), weights,
+                             minlength=n * GENE_COUNTS).reshape(n, GENE_COUNTS)
+    trait_mass += np.bincount((person * 2 + traits).ravel(), weights,
+                              minlength=n * 2).reshape(n, 2)
+
+
+def assignment_batch(family, start, stop):
+    """
+    Return (genes, traits) arrays for the assignments numbered `start` to
+    `stop` among all assignments consistent with the observed traits.
+
+    Assignment k gives person i the i-th base 3 digit of k // 2^u as gene
+    count, where u is the number of people with unknown trait, and the
+    people with unknown trait the bits of k % 2^u as traits.
+    """
+    k = np.arange(start, stop, dtype=np.int64)
+    unknown = np.flatnonzero(~family.observed)
+    gene_code, trait_code = np.divmod(k, 2 ** len(unknown))
+
+    powers = GENE_COUNTS ** np.arange(family.n, dtype=np.int64)
+    genes = (gene_code[:, None] // powers) % GENE_COUNTS
+    traits = np.broadcast_to(family.traits, genes.shape).copy()
+    traits[:, unknown] = (trait_code[:, None] >> np.arange(len(unknown))) & 1
+    return genes, traits
+
+
+def vectorized_probabilities(people, probs, batch_size=BATCH_SIZE):
+    """
+    Return the gene and trait distribution of every person given the
+    observed traits, in the layout `heredity.normalize` produces, by
+    evaluating every consistent assignment in batches of `batch_size`.
+
+    The marginals are kept relative to the largest log probability seen so
+    far and rescaled when a larger one comes along, so they stay finite
+    however small the joint probabilities get.
+    """
+    family = FamilyArrays(people)
+    tables = log_tables(probs)
+    n = family.n
+    total = GENE_COUNTS ** n * 2 ** int((~family.observed).sum())
+
+    gene_mass = np.zeros((n, GENE_COUNTS))
+    trait_mass = np.zeros((n, 2))
+    shift = -np.inf
+    for start in range(0, total, batch_size):
+        genes, traits = assignment_batch(family, start, min(start + batch_size, total))
+        log_p = log_joint_probabilities(family, genes, traits, tables)
+        batch_max = log_p.max()
+        if batch_max > shift:
+            if np.isfinite(shift):
+                scale = np.exp(shift - batch_max)
+                gene_mass *= scale
+                trait_mass *= scale
+            shift = batch_max
+        if np.isfinite(shift):
+            update_batch(gene_mass, trait_mass, genes, traits, np.exp(log_p - shift))
+
+    gene_mass /= gene_mass.sum(axis=1, keepdims=True)
+    trait_mass /= trait_mass.sum(axis=1, keepdims=True)
+    return {
+        name: {
+            "gene": {genes: float(gene_mass[i, genes]) for genes in (2, 1, 0)},
+            "trait": {True: float(trait_mass[i, 1]), False: float(trait_mass[i, 0])},
+        }
+        for i, name in enumerate(family.names)
+    }
@@ -0,0 +1,29 @@
+import multiprocessing
+
+
+def worker_pool(processes=None):
+    """
+    Return a multiprocessing pool of `processes` workers (default: one
+    per CPU) started with fork, so they see the module globals the parent
+    set up before creating the pool. Without fork (e.g. on Windows), or
+    when a single process is asked for, return an `InlinePool` instead.
+    """
+    if processes != 1 and "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork").Pool(processes)
+    return InlinePool()
+
+
+class InlinePool():
+    """
+    Stand-in for a pool that calls the function of `imap_unordered` on
+    every task in the calling process, in order.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def imap_unordered(self, function, tasks, chunksize=1):
+        return map(function, tasks)
@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import components
+import crawler
+import engine
+import incremental
+import pagerank
+import solvers
+from linkgraph import LinkGraph
+
+SMOKE_CORPORA = ["corpus0", "corpus1", "corpus2"]
+
+# Tolerance of the reference solution the L1 errors are measured against
+REFERENCE_TOLERANCE = 1e-14
+
+# Numbers of pages whose links are replaced in the incremental update runs
+EDIT_SIZES = [1, 10, 100]
+
+
+def write_synthetic_corpus(directory, n_pages, mean_links, exponent=2.1, seed=0):
+    """
+    Write `n_pages` HTML pages with power-law link structure into
+    `directory`.
+
+    Both the number of links on a page and the popularity of link targets
+    follow a Zipf-like distribution with the given `exponent`, as on the
+    web: a few hubs are linked from everywhere, most pages from almost
+    nowhere. Out-degrees are scaled to average about `mean_links`, and
+    pages that draw zero links have none.
+    """
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_pages + 1) ** (exponent - 1)
+    popularity /= popularity.sum()
+    # page i is the popularity[i]-th most popular page, in random order
+    popular_pages = rng.permutation(n_pages)
+
+    degrees = rng.zipf(exponent, n_pages) - 1
+    degrees = np.minimum(degrees, n_pages - 1)
+    if degrees.mean() > 0:
+        degrees = np.round(degrees * mean_links / degrees.mean()).astype(np.int64)
+    targets = popular_pages[rng.choice(n_pages, size=int(degrees.sum()), p=popularity)]
+
+    start = 0
+    for i, degree in enumerate(degrees):
+        links = "".join(f'<li><a href="{j}.html">Page {j}</a></li>\n'
+                        for j in targets[start:start + degree])
+        start += degree
+        with open(os.path.join(directory, f"{i}.html"), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<body>\n<h1>Page {i}</h1>\n"
+                    f"<ul>\n{links}</ul>\n</body>\n</html>\n")
+
+
+def measure(function, *args, **kwargs):
+    """
+    Call `function` twice and return (result, stats) where stats holds the
+    wall-clock "seconds" of the first call and the "peak_mb" of memory
+    allocated during the second, as traced by tracemalloc (NumPy arrays
+    included). Tracing slows down pure Python code a lot, so it is kept
+    out of the timed call.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {"seconds": seconds, "peak_mb": peak / 2**20}
+
+
+def l1_error(ranks, reference):
+    """Return the L1 distance between two dicts of page -> rank."""
+    return sum(abs(ranks.get(page, 0.0) - rank) for page, rank in reference.items())
+
+
+def edited_corpus(corpus, n_edits, seed=0):
+    """
+    Return (changed, corpus after the edit): `n_edits` random pages of
+    `corpus` get as many random links as they had, at least one.
+    """
+    rng = np.random.default_rng(seed)
+    pages = sorted(corpus)
+    n_edits = min(n_edits, len(pages))
+    changed = {}
+    for page in rng.choice(pages, size=n_edits, replace=False).tolist():
+        n_links = min(max(len(corpus[page]), 1), len(pages) - 1)
+        others = [pages[i] for i in rng.choice(len(pages), size=n_links + 1, replace=False)]
+        changed[page] = set([other for other in others if other != page][:n_links])
+    return changed, {**corpus, **changed}
+
+
+def benchmark_updates(corpus):
+    """
+    Compare `RankState.update` after small edits of `corpus` with solving
+    the edited corpus again, for every edit size in EDIT_SIZES. Return a
+    dict of edit size -> stats.
+    """
+    state = incremental.RankState.compute(LinkGraph.from_corpus(corpus), pagerank.DAMPING)
+    updates = {}
+    for n_edits in EDIT_SIZES:
+        if n_edits > len(corpus):
+            break
+        changed, edited = edited_corpus(corpus, n_edits)
+        graph = LinkGraph.from_corpus(edited)
+        matrix = engine.TransitionMatrix(graph)
+        reference, _ = engine.power_iteration(matrix, pagerank.DAMPING,
+                                              REFERENCE_TOLERANCE, 10000)
+        reference = dict(zip(graph.pages, reference.tolist()))
+
+        def update():
+            # every call edits its own copy of the state
+            copy = incremental.RankState(state.graph, state.ranks.copy(),
+                                         state.residual.copy(), state.uniform,
+                                         state.damping_factor)
+            return copy, copy.update(changed)
+
+        (updated, (rounds, pushes, iterations)), stats = measure(update)
+        _, compute_stats = measure(incremental.RankState.compute, graph, pagerank.DAMPING)
+        stats.update({
+            "recompute_seconds": compute_stats["seconds"],
+            "rounds": rounds,
+            "pushes": pushes,
+            "iterations": iterations,
+            "l1_error": l1_error(updated.to_dict(), reference),
+        })
+        updates[str(n_edits)] = stats
+    return updates
+
+
+def benchmark_corpus(directory, label, samples, slow_limit, processes):
+    """
+    Benchmark crawling, sampling, iteration and incremental updates on
+    the corpus `directory`.
+    The original pure Python `sample_pagerank` and `iterate_pagerank`
+    (and the Gauss-Seidel solver) only run on corpora of at most
+    `slow_limit` pages. Return a dict of results.
+    """
+    corpus, crawl_stats = measure(pagerank.crawl, directory)
+    (_, parallel_stats), parallel_measure = measure(crawler.crawl_graph, directory, processes)
+    crawl_stats["files_per_second"] = len(corpus) / crawl_stats["seconds"]
+    parallel_measure["files_per_second"] = parallel_stats["files_per_second"]
+
+    graph = LinkGraph.from_corpus(corpus)
+    matrix = engine.TransitionMatrix(graph)
+    reference, _ = engine.power_iteration(matrix, pagerank.DAMPING, REFERENCE_TOLERANCE, 10000)
+    reference = dict(zip(graph.pages, reference.tolist()))
+    small = len(corpus) <= slow_limit
+
+    samplers = {}
+    runs = {
+        "vectorized": lambda: pagerank.vectorized_sample_pagerank(corpus, pagerank.DAMPING,
+                                                                  samples, seed=0),
+        "parallel": lambda: pagerank.parallel_sample_pagerank(corpus, pagerank.DAMPING, samples,
+                                                              processes, seed=0)[0],
+    }
+    if small:
+        runs["sequential"] = lambda: pagerank.sample_pagerank(corpus, pagerank.DAMPING, samples)
+    for name, run in runs.items():
+        ranks, stats = measure(run)
+        stats["l1_error"] = l1_error(ranks, reference)
+        samplers[name] = stats
+
+    engines = {}
+    if small:
+        ranks, stats = measure(pagerank.iterate_pagerank, corpus, pagerank.DAMPING)
+        stats["iterations"] = None
+        stats["l1_error"] = l1_error(ranks, reference)
+        engines["sweep"] = stats
+    (ranks, iterations), stats = measure(engine.power_iteration, matrix, pagerank.DAMPING)
+    stats["iterations"] = iterations
+    stats["l1_error"] = l1_error(dict(zip(graph.pages, ranks.tolist())), reference)
+    engines["matrix"] = stats
+    (ranks, scc_stats), stats = measure(components.component_pagerank, graph, pagerank.DAMPING)
+    stats.update(scc_stats)
+    stats["l1_error"] = l1_error(dict(zip(graph.pages, ranks.tolist())), reference)
+    engines["scc"] = stats
+    for name, solver in solvers.SOLVERS.items():
+        if name == "gauss-seidel" and not small:
+            continue
+        (ranks, residuals), stats = measure(solver, graph, pagerank.DAMPING)
+        stats["iterations"] = len(residuals)
+        stats["l1_error"] = l1_error(dict(zip(graph.pages, ranks.tolist())), reference)
+        engines[name] = stats
+
+    return {
+        "corpus": label,
+        "pages": graph.n_pages,
+        "links": graph.n_links,
+        "samples": samples,
+        "crawl": {"serial": crawl_stats, "parallel": parallel_measure},
+        "sampling": samplers,
+        "iteration": engines,
+        "incremental": benchmark_updates(corpus),
+    }
+
+
+def summary(result):
+    """Return a few human readable lines about one `benchmark_corpus` result."""
+    lines = [f"{result['corpus']}: {result['pages']} pages, {result['links']} links"]
+    crawl = result["crawl"]
+    lines.append("  crawl files/s: " + ", ".join(
+        f"{name} {stats['files_per_second']:.0f}" for name, stats in crawl.items()))
+    for section in ("sampling", "iteration"):
+        for name, stats in result[section].items():
+            iterations = stats.get("iterations")
+            lines.append(f"  {section:<9} {name:<12} {stats['seconds']:>9.3f}s "
+                         f"{stats['peak_mb']:>8.1f} MB  L1 {stats['l1_error']:.1e}"
+                         + (f"  {iterations} iterations" if iterations else ""))
+    for n_edits, stats in result["incremental"].items():
+        lines.append(f"  update    {n_edits + ' pages':<12} {stats['seconds']:>9.3f}s "
+                     f"(recompute {stats['recompute_seconds']:.3f}s)  "
+                     f"L1 {stats['l1_error']:.1e}  {stats['pushes']} pushes, "
+                     f"{stats['iterations']} iterations")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark pagerank on corpus0-2 and synthetic power-law corpora.")
+    parser.add_argument("sizes", nargs="*", type=int, default=[1_000, 10_000, 100_000],
+                        help="numbers of pages of the synthetic corpora")
+    parser.add_argument("--links", type=float, default=8,
+                        help="mean number of links per synthetic page")
+    parser.add_argument("--exponent", type=float, default=2.1,
+                        help="power-law exponent of degrees and link popularity")
+    parser.add_argument("--samples", type=int, default=pagerank.SAMPLES,
+                        help=f"samples per sampler (default {pagerank.SAMPLES})")
+    parser.add_argument("--slow-limit", type=int, default=2_000,
+                        help="largest corpus for the pure Python sampler and sweeps")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes of the parallel crawler and sampler")
+    parser.add_argument("--output", default=None,
+                        help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for name in SMOKE_CORPORA:
+        results.append(benchmark_corpus(os.path.join(here, name), name, args.samples,
+                                        args.slow_limit, args.processes))
+        print(summary(results[-1]), file=sys.stderr)
+
+    # all randomness is seeded, so repeated runs measure the same corpora
+    for n_pages in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_corpus(directory, n_pages, args.links, args.exponent)
+            results.append(benchmark_corpus(directory, f"synthetic {n_pages}", args.samples,
+                                            args.slow_limit, args.processes))
+        print(summary(results[-1]), file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "damping": pagerank.DAMPING,
+            "links": args.links,
+            "exponent": args.exponent,
+            "samples": args.samples,
+            "slow_limit": args.slow_limit,
+            "reference_tolerance": REFERENCE_TOLERANCE,
+        },
+        "results": results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import re
+import time
+
+import numpy as np
+
+from linkgraph import LinkGraph
+from workers import worker_pool
+
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Number of bytes read from a page at once
+READ_SIZE = 1 << 16
+
+# Longest unfinished tag carried over from one block to the next
+MAX_CARRY = 1 << 16
+
+# Number of pages handed to a worker process at once
+BATCH_SIZE = 256
+
+# Directory, page names and page numbering read by the worker processes
+# of `crawl_graph`. Forked workers inherit them from the parent.
+shared_directory = None
+shared_pages = None
+shared_index = None
+
+
+def crawl_graph(directory, processes=None):
+    """
+    Parse the HTML pages of `directory` in parallel and return the link
+    graph together with a dict of statistics.
+
+    Pages are read block by block, so memory does not grow with the size
+    of a page. Worker processes translate the links of every page to page
+    indexes right away and send back one int32 array per batch of pages;
+    the parent only places them into the CSR arrays of a LinkGraph. Like `crawl`,
+    links to the page itself or to pages outside the corpus are dropped.
+    """
+    global shared_directory, shared_pages, shared_index
+    start = time.perf_counter()
+    pages = sorted(entry.name for entry in os.scandir(directory)
+                   if entry.name.endswith(".html") and entry.is_file())
+    shared_directory = directory
+    shared_pages = pages
+    shared_index = {page.encode("utf-8"): i for i, page in enumerate(pages)}
+
+    counts = np.zeros(len(pages), dtype=np.int64)
+    chunks = {}
+    batches = [range(i, min(i + BATCH_SIZE, len(pages)))
+               for i in range(0, len(pages), BATCH_SIZE)]
+    n_bytes = 0
+    with worker_pool(processes) as pool:
+        for first, batch_counts, batch_targets, size in pool.imap_unordered(page_batch_links,
+                                                                            batches):
+            n_bytes += size
+            counts[first:first + len(batch_counts)] = batch_counts
+            chunks[first] = batch_targets
+
+    offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    targets = (np.concatenate([chunks[first] for first in sorted(chunks)]) if chunks
+               else np.zeros(0, dtype=np.int32))
+    graph = LinkGraph(pages, offsets, targets)
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "files": len(pages),
+        "links": graph.n_links,
+        "bytes": n_bytes,
+        "seconds": seconds,
+        "files_per_second": len(pages) / seconds if seconds else 0.0,
+    }
+    return graph, stats
+
+
+def page_batch_links(batch):
+    """
+    Return the links of the pages numbered `batch` as (first page, number
+    of links of every page, int32 array of all their targets in page
+    order, number of bytes read). One array per batch keeps the cost of
+    sending results back independent of the number of pages.
+    """
+    counts = []
+    targets = []
+    size = 0
+    prefix = os.path.join(shared_directory, "")
+    lookup = shared_index.get
+    for i in batch:
+        links, n = page_links(prefix + shared_pages[i])
+        size += n
+        row = set(map(lookup, links))
+        row.discard(None)
+        row.discard(i)
+        counts.append(len(row))
+        targets.extend(sorted(row))
+    return (batch.start, np.array(counts, dtype=np.int64),
+            np.array(targets, dtype=np.int32), size)
+
+
+def page_links(path):
+    """
+    Return the set of link targets (as bytes) of the HTML page at `path`
+    and the number of bytes read, scanning the page block by block.
+
+    A tag may be cut in two by a block boundary, so everything from the
+    last "<" on is carried over to the next block (up to MAX_CARRY
+    bytes). A link found again that way is only added to the set once.
+    """
+    links = set()
+    size = 0
+    carry = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(READ_SIZE)
+            size += len(block)
+            text = carry + block
+            links.update(LINK.findall(text))
+            # a short read means the end of the file, which saves a read
+            if len(block) < READ_SIZE:
+                break
+            cut = text.rfind(b"<")
+            carry = text[cut:][-MAX_CARRY:] if cut != -1 else b""
+    return links, size
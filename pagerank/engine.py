@@ -0,0 +1,144 @@
+import numpy as np
+
+try:
+    import scipy.sparse as scipy_sparse
+except ImportError:
+    scipy_sparse = None
+
+# Number of teleport vectors iterated together by
+# `personalized_power_iteration`; larger blocks read the links less often
+# but their rank arrays stop fitting into the CPU caches
+BLOCK_COLUMNS = 8
+
+
+class TransitionMatrix():
+    """
+    Column-stochastic transition matrix of the random surfer, in COO form.
+
+    Entry (j, i) is 1 / out_degree(i) for every link i -> j. Pages without
+    links are not stored: their rank is spread over all pages, including
+    themselves, exactly as `get_corpus_with_corrected_links` does.
+    """
+
+    def __init__(self, graph):
+        out_degree = graph.out_degree()
+        self.n = graph.n_pages
+        self.sources = np.repeat(np.arange(self.n, dtype=np.int32), out_degree)
+        self.targets = graph.targets
+        with np.errstate(divide="ignore"):
+            self.weights = (1.0 / out_degree)[self.sources]
+        self.dangling = np.flatnonzero(out_degree == 0)
+        self.sparse = None
+
+    def multiply(self, x):
+        """Return the rank vector after one step of the surfer from `x`."""
+        # without any links bincount returns integers, which `+=` cannot take
+        y = np.bincount(self.targets, weights=x[self.sources] * self.weights,
+                        minlength=self.n).astype(float, copy=False)
+        if len(self.dangling):
+            y += x[self.dangling].sum() / self.n
+        return y
+
+    def follow_links(self, x):
+        """
+        Return the rank that flows along the links from `x`, without the
+        rank of pages without links. `x` is a rank vector or an (N, k)
+        block of k rank vectors.
+
+        Blocks are multiplied as one sparse matrix-matrix product if SciPy
+        is installed, which reads the links once for all k vectors;
+        otherwise column by column.
+        """
+        if x.ndim == 1:
+            return np.bincount(self.targets, weights=x[self.sources] * self.weights,
+                               minlength=self.n).astype(float, copy=False)
+        if scipy_sparse is None:
+            return np.column_stack([self.follow_links(column) for column in x.T])
+        if self.sparse is None:
+            self.sparse = scipy_sparse.csr_matrix((self.weights, (self.targets, self.sources)),
+                                                  shape=(self.n, self.n))
+        return self.sparse @ x
+
+
+def power_iteration(matrix, damping_factor, tolerance=1e-10, max_iterations=1000,
+                    initial=None):
+    """
+    Iterate PR = (1 - d) / N + d * P PR from the uniform vector, or from
+    the distribution `initial` if given, until the L1 distance between two
+    iterates falls below `tolerance`.
+
+    Return (ranks, number of iterations).
+    """
+    n = matrix.n
+    ranks = np.full(n, 1 / n) if initial is None else initial
+    teleport = (1 - damping_factor) / n
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = teleport + damping_factor * matrix.multiply(ranks)
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if residual < tolerance:
+            break
+    return ranks, iteration
+
+
+def personalized_power_iteration(matrix, damping_factor, teleport, tolerance=1e-10,
+                                 max_iterations=1000):
+    """
+    Iterate PR = d * P PR + (1 - d + d * dangling mass) * teleport, where
+    `teleport` is a distribution over the pages: the surfer restarts from
+    it, and pages without links send their rank to it as well. A uniform
+    `teleport` gives the plain PageRank of `power_iteration`.
+
+    `teleport` may be an (N, k) block of k distributions. With SciPy they
+    are solved together in groups of BLOCK_COLUMNS, so every iteration
+    reads the links once per group; within a group, columns whose L1
+    change falls below `tolerance` are fixed and drop out.
+
+    Return (ranks, number of iterations) with ranks shaped like `teleport`;
+    for a block, the iterations of the slowest column.
+    """
+    if teleport.ndim == 1:
+        ranks, iterations = personalized_block(matrix, damping_factor, teleport[:, None],
+                                               tolerance, max_iterations)
+        return ranks[:, 0], iterations
+
+    # without a sparse matrix-matrix product, grouping saves nothing
+    width = BLOCK_COLUMNS if scipy_sparse is not None else 1
+    ranks = np.empty(teleport.shape)
+    iterations = 0
+    for start in range(0, teleport.shape[1], width):
+        group = slice(start, start + width)
+        ranks[:, group], group_iterations = personalized_block(
+            matrix, damping_factor, teleport[:, group], tolerance, max_iterations)
+        iterations = max(iterations, group_iterations)
+    return ranks, iterations
+
+
+def personalized_block(matrix, damping_factor, block, tolerance, max_iterations):
+    """Run `personalized_power_iteration` on one (N, k) group of teleport vectors."""
+    block = np.ascontiguousarray(block)
+    ranks = np.empty(block.shape)
+    if block.shape[1] == 0:
+        # no column could ever meet the convergence test
+        return ranks, 0
+    columns = np.arange(block.shape[1])
+    x = block.copy()
+    for iteration in range(1, max_iterations + 1):
+        restart = 1 - damping_factor + damping_factor * x[matrix.dangling].sum(axis=0)
+        new = matrix.follow_links(x)
+        new *= damping_factor
+        new += restart * block
+        x -= new
+        residuals = np.abs(x, out=x).sum(axis=0)
+        x = new
+
+        converged = residuals < tolerance
+        if converged.any():
+            ranks[:, columns[converged]] = x[:, converged]
+            columns = columns[~converged]
+            x = x[:, ~converged]
+            block = block[:, ~converged]
+            if not len(columns):
+                break
+    ranks[:, columns] = x
+    return ranks, iteration
@@ -0,0 +1,130 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from linkgraph import LinkGraph
+
+EXTENSION = ".linkgraph"
+
+MAGIC = b"PRGRAPH1"
+VERSION = 1
+
+# Sections in file order: the CSR arrays of the graph, stored little
+# endian, and the "\0"-separated UTF-8 table of page names
+SECTIONS = ("offsets", "targets", "pages")
+DTYPES = {"offsets": "<i8", "targets": "<i4"}
+
+ALIGNMENT = 8
+
+
+def write(path, graph):
+    """
+    Write `graph` to the link graph file `path`.
+
+    The file is written to a temporary name first and renamed into place,
+    so a concurrent reader never sees a partial file.
+    """
+    blobs = {
+        "offsets": np.asarray(graph.offsets, dtype=DTYPES["offsets"]).tobytes(),
+        "targets": np.asarray(graph.targets, dtype=DTYPES["targets"]).tobytes(),
+        "pages": "\0".join(graph.pages).encode("utf-8"),
+    }
+
+    # section offsets are relative to the start of the data area
+    layout = {}
+    position = 0
+    for name in SECTIONS:
+        layout[name] = [position, len(blobs[name])]
+        position += aligned(len(blobs[name]))
+
+    header = json.dumps({
+        "version": VERSION,
+        "n_pages": graph.n_pages,
+        "n_links": graph.n_links,
+        "sections": layout,
+    }).encode("utf-8")
+    data_start = aligned(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(bytes(data_start - f.tell()))
+        for name in SECTIONS:
+            blob = blobs[name]
+            f.write(blob)
+            f.write(bytes(aligned(len(blob)) - len(blob)))
+    os.replace(tmp_path, path)
+
+
+def read(path):
+    """
+    Memory-map the link graph file `path` and return it as a LinkGraph.
+
+    The offset and target arrays are read-only views into the mapped file,
+    so they are paged in lazily; only the page names are decoded. Raise
+    ValueError if `path` is not a link graph file of this version or is
+    truncated or corrupt.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a link graph file")
+    try:
+        sections = read_sections(mm, path)
+    except (struct.error, KeyError, TypeError, UnicodeDecodeError) as error:
+        raise ValueError(f"{path} is a corrupt link graph file") from error
+
+    offsets = sections["offsets"]
+    if offsets[0] != 0 or offsets[-1] != len(sections["targets"]):
+        raise ValueError(f"{path} is a corrupt link graph file")
+    return LinkGraph(sections["pages"], offsets, sections["targets"])
+
+
+def read_sections(mm, path):
+    """
+    Return the sections of the mapped link graph file `mm` by name. Raise ValueError if it has another format version or a
+    section lies outside the file or does not fit the number of pages and
+    links in the header; malformed headers raise struct.error, ValueError,
+    KeyError or TypeError.
+    """
+    (header_length,) = struct.unpack_from("<Q", mm, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    if header_start + header_length > len(mm):
+        raise ValueError(f"{path} is a truncated link graph file")
+    header = json.loads(mm[header_start:header_start + header_length].decode("utf-8"))
+    if header["version"] != VERSION:
+        raise ValueError(f"{path} has link graph format version {header['version']}, "
+                         f"expected {VERSION}")
+
+    n_pages, n_links = int(header["n_pages"]), int(header["n_links"])
+    counts = {"offsets": n_pages + 1, "targets": n_links}
+    data_start = aligned(header_start + header_length)
+    sections = {}
+    for name in SECTIONS:
+        offset, length = header["sections"][name]
+        start = data_start + offset
+        if offset < 0 or length < 0 or start + length > len(mm):
+            raise ValueError(f"{path} is a truncated link graph file")
+        if name in DTYPES:
+            dtype = np.dtype(DTYPES[name])
+            if length != counts[name] * dtype.itemsize:
+                raise ValueError(f"Section {name} of {path} does not fit {n_pages} pages "
+                                 f"and {n_links} links")
+            sections[name] = np.frombuffer(mm, dtype=dtype, count=counts[name], offset=start)
+        else:
+            pages = str(mm[start:start + length], "utf-8")
+            sections[name] = pages.split("\0") if n_pages else []
+            if len(sections[name]) != n_pages:
+                raise ValueError(f"Section {name} of {path} does not hold {n_pages} pages")
+    return sections
+
+
+def aligned(n):
+    """Round `n` up to the next multiple of ALIGNMENT."""
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,72 @@
+import itertools
+
+import numpy as np
+
+
+class LinkGraph():
+    """
+    Link structure of a corpus in CSR form.
+
+    `index` maps every page to its position; it is built from `pages` when
+    first needed unless a matching dict is passed in.
+
+    Pages are numbered by their position in `pages`. The pages linked to by
+    page `i` are `targets[offsets[i]:offsets[i + 1]]`, sorted and without
+    duplicates, just like the sets of `crawl`.
+    """
+
+    def __init__(self, pages, offsets, targets, index=None):
+        self.pages = pages
+        self.offsets = offsets
+        self.targets = targets
+        self._index = index
+
+    @property
+    def index(self):
+        """Dict of page -> position, built on first use."""
+        if self._index is None:
+            self._index = {page: i for i, page in enumerate(self.pages)}
+        return self._index
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """Build the graph from a `crawl` style dict of page -> set of linked pages."""
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+
+        # all links at once: one dict lookup per link, sorted by NumPy
+        degree = np.array([len(corpus[page]) for page in pages], dtype=np.int64)
+        names = itertools.chain.from_iterable(corpus[page] for page in pages)
+        targets = np.fromiter((index.get(name, -1) for name in names), dtype=np.int64,
+                              count=int(degree.sum()))
+        sources = np.repeat(np.arange(len(pages)), degree)
+        known = targets >= 0
+        sources, targets = sources[known], targets[known]
+        order = np.lexsort((targets, sources))
+
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(pages)), out=offsets[1:])
+        return cls(pages, offsets, targets[order].astype(np.int32), index)
+
+    @property
+    def n_pages(self):
+        return len(self.pages)
+
+    @property
+    def n_links(self):
+        return len(self.targets)
+
+    def out_degree(self):
+        """Return the number of links on every page."""
+        return np.diff(self.offsets)
+
+    def links_of(self, i):
+        """Return the indexes of the pages linked to by page `i`."""
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def to_corpus(self):
+        """Return the graph as a `crawl` style dict of page -> set of linked pages."""
+        return {
+            page: {self.pages[j] for j in self.links_of(i)}
+            for i, page in enumerate(self.pages)
+        }
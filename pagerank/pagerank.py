@@ -1,24 +1,135 @@
+import argparse
 import os
 import random
 import re
 import sys
 
+import numpy as np
+
+import components
+import crawler
+import engine
+import graphfile
+import incremental
+import sampling
+import solvers
+from linkgraph import LinkGraph
+
 DAMPING = 0.85
 SAMPLES = 10000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    parser = argparse.ArgumentParser(description="Rank the pages of a corpus.")
+    parser.add_argument("corpus",
+                        help=f"directory of HTML pages or a {graphfile.EXTENSION} file "
+                             "written by --export")
+    parser.add_argument("--export", default=None,
+                        help="write the link graph of the corpus to this file")
+    parser.add_argument("--crawler", choices=["serial", "parallel"], default="serial",
+                        help="read the corpus with crawl (default) or with the streaming "
+                             "crawler in --processes worker processes")
+    parser.add_argument("--engine", choices=["matrix", "sweep", "scc", *solvers.SOLVERS],
+                        default="matrix",
+                        help="iteration engine: vectorized power iteration (default), "
+                             "the page by page sweep of iterate_pagerank, solving strongly "
+                             "connected components one after the other, or one of the "
+                             "solvers with residual reporting")
+    parser.add_argument("--solver-tolerance", type=float, default=1e-10,
+                        help="solvers: stop when the L1 residual is below this "
+                             "(default 1e-10)")
+    parser.add_argument("--residuals", action="store_true",
+                        help="solvers: print the L1 residual after every iteration")
+    parser.add_argument("--sampler", choices=["vectorized", "sequential", "parallel"],
+                        default="vectorized",
+                        help="many surfers moving as NumPy arrays (default), the single "
+                             "surfer of sample_pagerank, or independent surfer groups in "
+                             "several processes with confidence intervals")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help=f"number of samples (default {SAMPLES})")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes of the parallel sampler (default: all cores)")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="parallel sampler: add rounds of samples until every 95%% "
+                             "confidence half-width is at most this")
+    parser.add_argument("--max-samples", type=int, default=None,
+                        help="parallel sampler: sample budget when using --tolerance "
+                             f"(default {sampling.MAX_ROUNDS} times --samples)")
+    parser.add_argument("--state", default=None,
+                        help="rank file of an earlier run; only the pages that changed since "
+                             "are reranked and the file is updated")
+    parser.add_argument("--personalize", default=None,
+                        help="file with one set of seed pages per line, separated by "
+                             "spaces; prints the PageRank personalized to every set")
+    args = parser.parse_args()
+
+    corpus = None
+    if os.path.isfile(args.corpus):
+        try:
+            graph = graphfile.read(args.corpus)
+        except ValueError as error:
+            sys.exit(f"Cannot read link graph: {error}")
+    elif args.crawler == "parallel":
+        graph, stats = crawler.crawl_graph(args.corpus, args.processes)
+        print(f"Crawled {stats['files']} files with {stats['links']} links in "
+              f"{stats['seconds']:.2f}s ({stats['files_per_second']:.0f} files/sec)")
+    else:
+        corpus = crawl(args.corpus)
+        graph = LinkGraph.from_corpus(corpus)
+    if args.export is not None:
+        graphfile.write(args.export, graph)
+
+    # only the pure Python sampler and sweeps need the corpus as a dict
+    uses_dict = args.sampler == "sequential" or (args.state is None and args.engine == "sweep")
+    if corpus is None and uses_dict:
+        corpus = graph.to_corpus()
+    half_widths = None
+    samples = args.samples
+    if args.sampler == "parallel":
+        ranks, half_widths, samples = parallel_sample_pagerank(
+            graph, DAMPING, args.samples, args.processes,
+            tolerance=args.tolerance, max_samples=args.max_samples)
+    elif args.sampler == "vectorized":
+        ranks = vectorized_sample_pagerank(graph, DAMPING, args.samples)
+    else:
+        ranks = sample_pagerank(corpus, DAMPING, args.samples)
+    print(f"PageRank Results from Sampling (n = {samples})")
     for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+        if half_widths is None:
+            print(f"  {page}: {ranks[page]:.4f}")
+        else:
+            print(f"  {page}: {ranks[page]:.4f} ± {half_widths[page]:.4f}")
+    if args.state is not None:
+        ranks = incremental_pagerank(graph, DAMPING, args.state)
+    elif args.engine == "matrix":
+        ranks = matrix_pagerank(graph, DAMPING)
+    elif args.engine == "scc":
+        ranks = scc_pagerank(graph, DAMPING, args.solver_tolerance)
+    elif args.engine in solvers.SOLVERS:
+        report = print_residual if args.residuals else None
+        ranks = solver_pagerank(graph, DAMPING, args.engine, args.solver_tolerance, report)
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
+    if args.personalize is not None:
+        with open(args.personalize) as f:
+            seed_sets = [line.split() for line in f if line.strip()]
+        teleports = [dict.fromkeys(seeds, 1) for seeds in seed_sets]
+        try:
+            personalized = batched_personalized_pagerank(graph, DAMPING, teleports)
+        except ValueError as error:
+            sys.exit(str(error))
+        for seeds, ranks in zip(seed_sets, personalized):
+            print(f"Personalized PageRank Results for {' '.join(seeds)}")
+            for page in sorted(ranks):
+                print(f"  {page}: {ranks[page]:.4f}")
+
+
+def print_residual(iteration, residual):
+    """Print the L1 residual of a solver after `iteration`, for --residuals."""
+    print(f"  iteration {iteration}: residual {residual:.3e}")
 
 
 def crawl(directory):
@@ -102,7 +213,13 @@ def sample_pagerank(corpus, damping_factor, n):
     corpus_mod = corpus.copy()
 
     pages_all = list(corpus_mod.keys())
-    page_current = random.choice(list(corpus_mod.keys()))
+    page_current = random.choice(pages_all)
+
+    # The transition model of a page mixes "follow one of its links" with
+    # "jump to any page". Precomputing the link tuples once and drawing from
+    # the two parts directly makes every step O(1), instead of rebuilding
+    # the full distribution of transition_model for every sample.
+    links = {page: tuple(corpus_mod[page]) for page in pages_all}
 
     page_counter = {k: 0 for k in pages_all}
     for _ in range(n):
@@ -110,16 +227,56 @@ def sample_pagerank(corpus, damping_factor, n):
         #add 1 to the page counter
         page_counter[page_current] += 1
 
-        # get transition model
-        tm = transition_model(corpus_mod, page_current, damping_factor)
-
-        # choose randomly among transition model probabilities
-        weightings = list(tm.values())
-        page_current = random.choices(pages_all, weightings, k=1)[0]
+        # choose the next page according to the transition model
+        page_links = links[page_current]
+        if page_links and random.random() < damping_factor:
+            page_current = random.choice(page_links)
+        else:
+            page_current = random.choice(pages_all)
 
     return {k: v/n for k, v in page_counter.items()}
 
 
+def vectorized_sample_pagerank(corpus, damping_factor, n, walkers=1024, seed=None):
+    """
+    Return PageRank values estimated from `n` samples like
+    `sample_pagerank`, but drawn by `walkers` random surfers that move
+    together as NumPy arrays. `seed` makes the result reproducible.
+    """
+    graph = link_graph(corpus)
+    counts = sampling.walk_counts(graph, damping_factor, n, walkers, seed)
+    return dict(zip(graph.pages, (counts / n).tolist()))
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, processes=None, chunks=16,
+                             seed=None, tolerance=None, max_samples=None):
+    """
+    Estimate PageRank values from `n` samples drawn by independent,
+    separately seeded groups of surfers spread over `processes` worker
+    processes.
+
+    Return (ranks, half_widths, samples): the estimated PageRank values,
+    the half-width of their 95% confidence intervals and the number of
+    samples used. With a `tolerance`, samples are added in rounds of `n`
+    until every half-width is at most `tolerance`, or `max_samples` were
+    drawn (by default sampling.MAX_ROUNDS rounds).
+    """
+    graph = link_graph(corpus)
+    ranks, half_widths, samples = sampling.parallel_estimate(
+        graph, damping_factor, n, chunks, processes, seed, tolerance, max_samples)
+    return (dict(zip(graph.pages, ranks.tolist())),
+            dict(zip(graph.pages, half_widths.tolist())),
+            samples)
+
+
+def link_graph(corpus):
+    """
+    Return `corpus` as a LinkGraph. The vectorized samplers and engines
+    accept a `crawl` style dict or a LinkGraph, which is used as is.
+    """
+    return corpus if isinstance(corpus, LinkGraph) else LinkGraph.from_corpus(corpus)
+
+
 def update_page_ranks(page_ranks, corpus, damping_factor):
     """updates all page ranks within page_ranks dictionary
        returns a list of error factors: new/old"""
@@ -177,5 +334,106 @@ def iterate_pagerank(corpus, damping_factor):
     return page_ranks
 
 
+def matrix_pagerank(corpus, damping_factor, tolerance=1e-10):
+    """
+    Return the same PageRank values as `iterate_pagerank`, computed by
+    power iteration with a sparse transition matrix that is built once.
+
+    Pages without links are treated as linking to every page, as in
+    `get_corpus_with_corrected_links`. Iteration stops when the L1 change
+    of the rank vector falls below `tolerance`.
+    """
+    graph = link_graph(corpus)
+    ranks, _ = engine.power_iteration(engine.TransitionMatrix(graph), damping_factor, tolerance)
+    return dict(zip(graph.pages, ranks.tolist()))
+
+
+def personalized_pagerank(corpus, damping_factor, teleport, tolerance=1e-10):
+    """
+    Return PageRank values for a surfer who, instead of jumping to a page
+    at random, jumps to the pages of the dict `teleport` with probability
+    proportional to their weight. Pages without links also lead there.
+    """
+    return batched_personalized_pagerank(corpus, damping_factor, [teleport], tolerance)[0]
+
+
+def batched_personalized_pagerank(corpus, damping_factor, teleports, tolerance=1e-10):
+    """
+    Return a list with the `personalized_pagerank` values for each dict of
+    the list `teleports`. All of them are solved with one transition
+    matrix, as columns of one block of rank vectors.
+    """
+    if not teleports:
+        return []
+    graph = link_graph(corpus)
+    block = np.zeros((graph.n_pages, len(teleports)))
+    for k, teleport in enumerate(teleports):
+        for page, weight in teleport.items():
+            if page not in graph.index:
+                raise ValueError(f"Teleport page {page} is not in the corpus")
+            block[graph.index[page], k] = weight
+        total = block[:, k].sum()
+        if total <= 0:
+            raise ValueError("Teleport weights must have a positive sum")
+        block[:, k] /= total
+
+    ranks, _ = engine.personalized_power_iteration(engine.TransitionMatrix(graph),
+                                                   damping_factor, block, tolerance)
+    return [dict(zip(graph.pages, column.tolist())) for column in ranks.T]
+
+
+def scc_pagerank(corpus, damping_factor, tolerance=1e-10):
+    """
+    Return the same PageRank values as `matrix_pagerank`, solved one
+    strongly connected component after the other in topological order
+    (see `components.component_pagerank`).
+    """
+    graph = link_graph(corpus)
+    ranks, _ = components.component_pagerank(graph, damping_factor, tolerance)
+    return dict(zip(graph.pages, ranks.tolist()))
+
+
+def solver_pagerank(corpus, damping_factor, solver, tolerance=1e-10, report=None):
+    """
+    Return PageRank values computed by the named solver of
+    `solvers.SOLVERS`, stopping when the L1 residual falls below
+    `tolerance`. `report(iteration, residual)` is called after every
+    iteration if given.
+    """
+    graph = link_graph(corpus)
+    ranks, _ = solvers.SOLVERS[solver](graph, damping_factor, tolerance, report=report)
+    return dict(zip(graph.pages, ranks.tolist()))
+
+
+def incremental_pagerank(corpus, damping_factor, path, tolerance=1e-10):
+    """
+    Return the PageRank values of `corpus` (a `crawl` style dict or a
+    LinkGraph), reusing the state saved at `path` by an earlier call.
+
+    The links are compared with the saved link structure and only the
+    added, changed and removed pages are passed to `RankState.update`. If
+    there is no usable state yet (missing, unreadable, of an older format)
+    or it used another damping factor, the ranks are computed from
+    scratch. The state is written back to `path` unless
+    nothing changed.
+    """
+    graph = link_graph(corpus)
+    state = None
+    if os.path.exists(path):
+        state = incremental.RankState.load(path)
+        if state is not None and state.damping_factor != damping_factor:
+            state = None
+
+    if state is None:
+        state = incremental.RankState.compute(graph, damping_factor, tolerance)
+        state.save(path)
+    else:
+        changed, removed = incremental.graph_changes(state.graph, graph)
+        if changed or removed:
+            state.update(changed, removed, tolerance)
+            state.save(path)
+    return state.to_dict()
+
+
 if __name__ == "__main__":
     main()
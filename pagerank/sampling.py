@@ -0,0 +1,166 @@
+import math
+
+import numpy as np
+
+from workers import worker_pool
+
+# Number of steps whose visits are buffered before they are counted
+FLUSH_STEPS = 256
+
+# Bound on the distance (total variation) between the distribution of a
+# surfer after its burn-in steps and the PageRank distribution
+BURN_IN_ERROR = 1e-4
+
+# Rounds of samples the parallel sampler draws at most when it has a
+# tolerance but no explicit sample budget
+MAX_ROUNDS = 100
+
+# Two-sided 95% quantile of the normal distribution
+Z_95 = 1.959964
+
+# Two-sided 95% quantiles of Student's t distribution for 1 to 10 degrees
+# of freedom, where the Cornish-Fisher expansion is too inaccurate
+T_95 = (12.706205, 4.302653, 3.182446, 2.776445, 2.570582,
+        2.446912, 2.364624, 2.306004, 2.262157, 2.228139)
+
+# Graph read by the worker processes of parallel_estimate. Forked workers
+# inherit it from the parent instead of receiving a pickled copy.
+shared_graph = None
+
+
+def walk_counts(graph, damping_factor, n, walkers=1024, seed=None):
+    """
+    Sample `n` pages with `walkers` independent random surfers that move
+    in lock step, and return the number of visits of every page.
+
+    Every surfer starts on a page chosen at random. The transition model
+    is split into its two parts instead of materializing a distribution
+    per page: with probability `damping_factor` a surfer follows one of
+    the links of its page (looked up in the CSR arrays of `graph`),
+    otherwise, or if the page has no links, it jumps to a random page.
+
+    Each surfer jumps at random with probability at least
+    1 - `damping_factor` per step, so after k steps its distribution is
+    within damping_factor ** k of the PageRank distribution. Surfers take
+    enough uncounted burn-in steps to get within BURN_IN_ERROR, so that
+    short walks of many surfers do not bias the estimate towards the
+    uniform start.
+    """
+    rng = np.random.default_rng(seed)
+    n_pages = graph.n_pages
+    out_degree = graph.out_degree()
+    offsets = graph.offsets
+    targets = graph.targets
+
+    walkers = max(1, min(walkers, n))
+    steps, remainder = divmod(n, walkers)
+    counts = np.zeros(n_pages, dtype=np.int64)
+    visits = np.empty((FLUSH_STEPS, walkers), dtype=np.int64)
+
+    current = rng.integers(0, n_pages, walkers)
+    for _ in range(burn_in_steps(damping_factor)):
+        current = step(current, rng, damping_factor, n_pages, out_degree, offsets, targets)
+
+    buffered = 0
+    for _ in range(steps):
+        visits[buffered] = current
+        buffered += 1
+        if buffered == FLUSH_STEPS:
+            counts += np.bincount(visits.ravel(), minlength=n_pages)
+            buffered = 0
+        current = step(current, rng, damping_factor, n_pages, out_degree, offsets, targets)
+
+    counts += np.bincount(visits[:buffered].ravel(), minlength=n_pages)
+    counts += np.bincount(current[:remainder], minlength=n_pages)
+    return counts
+
+
+def burn_in_steps(damping_factor):
+    """Return the number of steps after which a surfer is BURN_IN_ERROR close to PageRank."""
+    if damping_factor <= 0:
+        return 0
+    if damping_factor >= 1:
+        raise ValueError("The damping factor must be below 1")
+    return math.ceil(math.log(BURN_IN_ERROR) / math.log(damping_factor))
+
+
+def step(current, rng, damping_factor, n_pages, out_degree, offsets, targets):
+    """Move every surfer on page `current[k]` one step."""
+    degree = out_degree[current]
+    follow = np.flatnonzero((rng.random(len(current)) < damping_factor) & (degree > 0))
+    following = rng.integers(0, n_pages, len(current))
+    choice = (rng.random(len(follow)) * degree[follow]).astype(np.int64)
+    following[follow] = targets[offsets[current[follow]] + choice]
+    return following
+
+
+def chunk_counts(task):
+    """
+    Run one independent chunk of walks on `shared_graph`.
+    `task` is (damping_factor, samples, walkers, seed sequence).
+    """
+    damping_factor, samples, walkers, seed = task
+    return walk_counts(shared_graph, damping_factor, samples, walkers, seed)
+
+
+def parallel_estimate(graph, damping_factor, n, chunks=16, processes=None, seed=None,
+                      tolerance=None, max_samples=None, walkers=1024):
+    """
+    Estimate PageRank from `n` samples split into `chunks` independent
+    chunks of walks, each with its own RNG spawned from `seed`, run on a
+    pool of `processes` forked worker processes.
+
+    The chunk estimates are independent, so their spread gives a 95%
+    confidence interval for every page. With a `tolerance`, further rounds
+    of `n` samples are added until the widest interval half-width is at
+    most `tolerance` or `max_samples` samples were drawn (by default
+    MAX_ROUNDS rounds).
+
+    Return (ranks, half_widths, number of samples).
+    """
+    global shared_graph
+    shared_graph = graph
+
+    chunks = max(2, chunks)
+    per_chunk = max(1, n // chunks)
+    seeds = np.random.SeedSequence(seed)
+    if max_samples is None:
+        max_samples = n if tolerance is None else MAX_ROUNDS * n
+
+    estimates = []
+    total = 0
+    with worker_pool(processes) as pool:
+        while True:
+            tasks = [(damping_factor, per_chunk, walkers, s) for s in seeds.spawn(chunks)]
+            for counts in pool.imap_unordered(chunk_counts, tasks):
+                estimates.append(counts / per_chunk)
+            total += per_chunk * chunks
+
+            ranks, half_widths = confidence_intervals(np.array(estimates))
+            if tolerance is None or half_widths.max() <= tolerance or total >= max_samples:
+                return ranks, half_widths, total
+
+
+def confidence_intervals(estimates):
+    """
+    Return the mean and the 95% confidence half-width per page of the
+    independent estimates in the rows of `estimates`.
+    """
+    k = len(estimates)
+    ranks = estimates.mean(axis=0)
+    half_widths = t_quantile_95(k - 1) * estimates.std(axis=0, ddof=1) / np.sqrt(k)
+    return ranks, half_widths
+
+
+def t_quantile_95(dof):
+    """
+    Two-sided 95% quantile of Student's t distribution with `dof` degrees
+    of freedom: exact from the T_95 table up to 10 degrees of freedom,
+    beyond by the Cornish-Fisher expansion around the normal quantile
+    (accurate to about 2e-3 there).
+    """
+    if dof <= len(T_95):
+        return T_95[dof - 1]
+    z = Z_95
+    return (z + (z ** 3 + z) / (4 * dof)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2))
@@ -0,0 +1,176 @@
+from collections import deque
+from functools import partial
+
+import numpy as np
+
+import engine
+
+# Number of plain iterations between two extrapolation steps
+EXTRAPOLATION_PERIOD = 10
+
+
+def jacobi(graph, damping_factor, tolerance=1e-10, max_iterations=1000, report=None):
+    """
+    Solve PR = (1 - d) / N + d * P PR by Jacobi iteration, i.e. power
+    iteration on the whole rank vector at once.
+
+    Stop when the L1 residual |(1 - d) / N + d * P PR - PR| falls below
+    `tolerance`. `report(iteration, residual)` is called after every
+    iteration if given. Return (ranks, list of residuals).
+    """
+    matrix = engine.TransitionMatrix(graph)
+    n = matrix.n
+    teleport = (1 - damping_factor) / n
+    ranks = np.full(n, 1 / n)
+    residuals = []
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = teleport + damping_factor * matrix.multiply(ranks)
+        # for Jacobi the change between iterates is the residual of `ranks`
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if record(residuals, iteration, residual, report) < tolerance:
+            break
+    return ranks, residuals
+
+
+def gauss_seidel(graph, damping_factor, tolerance=1e-10, max_iterations=1000, report=None):
+    """
+    Solve PageRank by Gauss-Seidel sweeps: pages are updated one after
+    the other, each from the newest values of the pages linking to it.
+    The rank mass of pages without links is tracked as it changes, and
+    the ranks are rescaled to sum 1 after every sweep.
+
+    Every sweep is a Python loop over all links, so a sweep is slower than
+    a Jacobi iteration, but fewer sweeps are needed. Stopping and
+    reporting work like in `jacobi`; the residual is computed once per
+    sweep.
+    """
+    matrix = engine.TransitionMatrix(graph)
+    n = matrix.n
+    teleport = (1 - damping_factor) / n
+    out_degree = graph.out_degree()
+
+    # links grouped by target page
+    order = np.argsort(graph.targets, kind="stable")
+    in_sources = matrix.sources[order].tolist()
+    in_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(graph.targets, minlength=n), out=in_offsets[1:])
+    in_offsets = in_offsets.tolist()
+
+    with np.errstate(divide="ignore"):
+        inverse_degree = np.where(out_degree > 0, 1.0 / out_degree, 0.0)
+    dangling = out_degree == 0
+    x = np.full(n, 1 / n)
+    ranks = x.tolist()
+    # rank divided by out-degree, the share passed along every link
+    shares = (x * inverse_degree).tolist()
+    dangling_mass = x[dangling].sum()
+    is_dangling = dangling.tolist()
+    inverse = inverse_degree.tolist()
+
+    residuals = []
+    for iteration in range(1, max_iterations + 1):
+        for i in range(n):
+            total = 0.0
+            for k in range(in_offsets[i], in_offsets[i + 1]):
+                total += shares[in_sources[k]]
+            rank = teleport + damping_factor * (total + dangling_mass / n)
+            if is_dangling[i]:
+                dangling_mass += rank - ranks[i]
+            ranks[i] = rank
+            shares[i] = rank * inverse[i]
+
+        # the solution sums to 1; rescaling removes the error in total
+        # mass, which sweeps alone shrink only slowly
+        x = np.array(ranks)
+        x /= x.sum()
+        ranks = x.tolist()
+        shares = (x * inverse_degree).tolist()
+        dangling_mass = x[dangling].sum()
+
+        residual = np.abs(teleport + damping_factor * matrix.multiply(x) - x).sum()
+        if record(residuals, iteration, residual, report) < tolerance:
+            break
+    return x, residuals
+
+
+def extrapolated(graph, damping_factor, tolerance=1e-10, max_iterations=1000, report=None,
+                 method="quadratic", period=EXTRAPOLATION_PERIOD):
+    """
+    Power iteration that every `period` iterations replaces the current
+    iterate by an extrapolation of the last ones, which removes the
+    slowest decaying error components.
+
+    `method` is "quadratic" (Kamvar et al., from the last four iterates)
+    or "aitken" (component-wise Aitken delta-squared, from the last
+    three). Stopping and reporting work like in `jacobi`.
+    """
+    extrapolate = {"quadratic": quadratic_extrapolation, "aitken": aitken_extrapolation}[method]
+    matrix = engine.TransitionMatrix(graph)
+    n = matrix.n
+    teleport = (1 - damping_factor) / n
+    ranks = np.full(n, 1 / n)
+    history = deque([ranks], maxlen=4)
+    residuals = []
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = teleport + damping_factor * matrix.multiply(ranks)
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if record(residuals, iteration, residual, report) < tolerance:
+            break
+        history.append(ranks)
+        if iteration % period == 0 and len(history) == history.maxlen:
+            ranks = extrapolate(list(history))
+            history = deque([ranks], maxlen=4)
+    return ranks, residuals
+
+
+def quadratic_extrapolation(iterates):
+    """
+    Return the quadratic extrapolation of the last four power iterates,
+    assuming the error lies in the span of the next two eigenvectors.
+    """
+    x0, x1, x2, x3 = iterates[-4:]
+    y = np.stack([x1 - x0, x2 - x0], axis=1)
+    gamma, *_ = np.linalg.lstsq(y, -(x3 - x0), rcond=None)
+    g1, g2 = gamma
+    g3 = 1.0
+    ranks = (g1 + g2 + g3) * x1 + (g2 + g3) * x2 + g3 * x3
+    return normalized(ranks)
+
+
+def aitken_extrapolation(iterates):
+    """
+    Return the component-wise Aitken delta-squared extrapolation of the
+    last three power iterates. Components whose second difference
+    vanishes keep their newest value.
+    """
+    x0, x1, x2 = iterates[-3:]
+    second = x2 - 2 * x1 + x0
+    usable = np.abs(second) > 1e-15
+    ranks = x2.copy()
+    ranks[usable] = x0[usable] - (x1[usable] - x0[usable]) ** 2 / second[usable]
+    return normalized(ranks)
+
+
+def normalized(ranks):
+    """Return the absolute values of `ranks`, scaled to sum 1."""
+    ranks = np.abs(ranks)
+    return ranks / ranks.sum()
+
+
+def record(residuals, iteration, residual, report):
+    """Append `residual` to `residuals`, pass it to `report` and return it."""
+    residual = float(residual)
+    residuals.append(residual)
+    if report is not None:
+        report(iteration, residual)
+    return residual
+
+
+SOLVERS = {
+    "jacobi": jacobi,
+    "gauss-seidel": gauss_seidel,
+    "quadratic": extrapolated,
+    "aitken": partial(extrapolated, method="aitken"),
+}
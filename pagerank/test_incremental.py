@@ -0,0 +1,31 @@
+import numpy as np
+
+import incremental
+import pagerank
+from linkgraph import LinkGraph
+
+
+def test_update_replacing_every_page():
+    state = incremental.RankState.compute(LinkGraph.from_corpus({"a": {"b"}, "b": set()}),
+                                          pagerank.DAMPING)
+    corpus = {"c": {"d"}, "d": set()}
+    state.update(corpus, removed=["a", "b"])
+
+    ranks = state.to_dict()
+    expected = pagerank.matrix_pagerank(corpus, pagerank.DAMPING)
+    assert set(ranks) == set(expected)
+    for page in expected:
+        assert abs(ranks[page] - expected[page]) < 1e-8
+
+
+def test_save_refuses_non_finite_ranks(tmp_path):
+    state = incremental.RankState.compute(LinkGraph.from_corpus({"a": {"b"}, "b": set()}),
+                                          pagerank.DAMPING)
+    state.ranks = np.array([np.nan, np.nan])
+    try:
+        state.save(tmp_path / "state.npz")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("non-finite ranks were saved")
+    assert not (tmp_path / "state.npz").exists()